@@ -26,4 +26,12 @@ python manage.py migrate --noinput || {
 echo "📊 Poblando datos iniciales de Aplyfly..."
 python manage.py populate_aplyfly_data
 
+# Recalcular artículos relacionados del blog
+echo "🔗 Calculando artículos relacionados..."
+python manage.py compute_related_posts
+
+# Generar los sitemaps estáticos
+echo "🗺️ Generando sitemaps..."
+python manage.py build_sitemaps
+
 echo "✅ Build completado exitosamente!"
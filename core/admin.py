@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Service, Testimonial, ContactMessage, BlogCategory, BlogPost
+from django.db import transaction
+from .models import RELATED_POSTS_ON_SAVE, Service, Testimonial, ContactMessage, BlogCategory, BlogPost, Tag, ChatConversation, ChatRequestMetric
+from . import blog_cache, related_posts
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
@@ -29,6 +31,12 @@ class BlogCategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('created_at',)
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'post_count')
+    search_fields = ('name', 'slug')
+    readonly_fields = ('post_count',)
+
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'author', 'status', 'is_news', 'published_at', 'views_count')
@@ -69,3 +77,33 @@ class BlogPostAdmin(admin.ModelAdmin):
         if not obj.author_id:
             obj.author = request.user
         super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # related_posts is written after save(): refresh neighbours (same rule as
+        # BlogPost.save, otherwise the hourly cron picks it up) and cached pages
+        if RELATED_POSTS_ON_SAVE:
+            post_ids = [form.instance.pk]
+            transaction.on_commit(lambda: related_posts.compute_related(post_ids))
+        blog_cache.bump_blog_version()
+
+@admin.register(ChatConversation)
+class ChatConversationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'message_count', 'created_at', 'updated_at')
+    readonly_fields = ('id', 'turns', 'message_count', 'created_at', 'updated_at')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ChatRequestMetric)
+class ChatRequestMetricAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'outcome', 'provider', 'streaming', 'ttft_ms', 'total_ms', 'prompt_tokens', 'completion_tokens')
+    list_filter = ('outcome', 'provider', 'streaming')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
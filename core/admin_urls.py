@@ -19,4 +19,7 @@ urlpatterns = [
     # Clients
     path('clients/', admin_views.admin_clients_list, name='clients'),
     path('clients/<int:pk>/', admin_views.admin_client_detail, name='client_detail'),
+    
+    # Chat IA
+    path('chat/', admin_views.admin_chat_metrics, name='chat_metrics'),
 ]
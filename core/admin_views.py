@@ -6,6 +6,7 @@ from django.core.paginator import Paginator
 from django.utils import timezone
 from clients.models import Project, ServiceRequest, CustomUser, ProjectAttachment
 from decimal import Decimal
+from . import chat_telemetry
 
 def is_admin(user):
     """Check if user is admin"""
@@ -234,3 +235,25 @@ def admin_client_detail(request, pk):
     }
     
     return render(request, 'admin/clients/detail.html', context)
+
+
+@admin_required
+def admin_chat_metrics(request):
+    """AplyBot telemetry: latency percentiles, tokens and fallback rate per hour"""
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 24 * 7)
+    except ValueError:
+        hours = 24
+    
+    # Lo que este worker aún no ha escrito
+    chat_telemetry.flush(wait=True)
+    hourly, overall = chat_telemetry.hourly_summary(hours)
+    
+    context = {
+        'hours': hours,
+        'hour_options': [6, 24, 72, 168],
+        'hourly': hourly,
+        'overall': overall,
+    }
+    
+    return render(request, 'admin/chat_metrics.html', context)
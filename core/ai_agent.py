@@ -1,59 +1,40 @@
 import os
-import asyncio
-import json
-from openai import AzureOpenAI
+import hashlib
+import threading
 from django.conf import settings
 from typing import AsyncGenerator, Dict, Any
 import logging
+from .chat_cache import ResponseCache, make_key
+from . import chat_providers, chat_telemetry
+from .chat_coalesce import SingleFlight
+from .chat_prompt import build_messages
 
 logger = logging.getLogger(__name__)
 
+# Respuestas fijas: sin proveedor configurado y cuando el modelo falla
+FALLBACK_MESSAGE = "🤖 Hola! Soy AplyBot de Aplyfly. Actualmente estamos configurando el sistema. Por favor contacta directamente a contacto@aplifly.com para una consulta inmediata."
+ERROR_MESSAGE = "🤖 Disculpa, hubo un error técnico. Por favor contacta directamente a contacto@aplifly.com para una respuesta inmediata. Estamos aquí para ayudarte! 🔧"
+
 class AplyflyChatAgent:
     """
     Agente de IA especializado para Aplyfly usando Azure OpenAI GPT-4o
     Asistente de atención al cliente inteligente con contexto real
     """
     
-    def __init__(self):
+    def __init__(self, provider=None):
         self._init_error = None  # Para almacenar errores de inicialización
-        try:
-            # Configuración de Azure OpenAI con validación
-            endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-            api_key = os.getenv("AZURE_OPENAI_API_KEY")
-            
-            if not endpoint or not api_key:
-                self._init_error = "Variables de entorno de Azure OpenAI no configuradas"
-                logger.warning("Variables de entorno de Azure OpenAI no configuradas, usando respuestas de fallback")
-                self.client = None
-            else:
-                # Inicialización robusta del cliente Azure OpenAI
-                try:
-                    self.client = AzureOpenAI(
-                        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
-                        azure_endpoint=endpoint,
-                        api_key=api_key
-                    )
-                    
-                    self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
-                    self.max_tokens = int(os.getenv("CHAT_MAX_TOKENS", "1000"))
-                    self.temperature = float(os.getenv("CHAT_TEMPERATURE", "0.7"))
-                    
-                    logger.info(f"AplyflyChatAgent inicializado correctamente con modelo: {self.deployment_name}")
-                    
-                except TypeError as te:
-                    self._init_error = f"Error de compatibilidad OpenAI: {str(te)}"
-                    logger.warning(f"Error de compatibilidad OpenAI: {str(te)}")
-                    self.client = None
-                except Exception as ee:
-                    self._init_error = f"Error general OpenAI: {str(ee)}"
-                    logger.warning(f"Error general OpenAI: {str(ee)}")
-                    self.client = None
-            
-        except Exception as e:
-            self._init_error = f"Error inicializando AplyflyChatAgent: {str(e)}"
-            logger.warning(f"Error inicializando AplyflyChatAgent: {str(e)}")
-            # En producción, usar respuestas de fallback si Azure OpenAI no está disponible
-            self.client = None
+        # Respuestas completas a preguntas repetidas (core.chat_cache)
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "256")),
+            ttl=int(os.getenv("CHAT_CACHE_TTL", "3600")),
+        )
+        # Peticiones idénticas simultáneas comparten una sola generación (core.chat_coalesce)
+        self.coalesce = os.getenv("CHAT_COALESCE", "True") == "True"
+        self.single_flight = SingleFlight()
+        self.max_tokens = int(os.getenv("CHAT_MAX_TOKENS", "1000"))
+        self.temperature = float(os.getenv("CHAT_TEMPERATURE", "0.7"))
+        # Proveedor del modelo (core.chat_providers); None = respuestas de fallback
+        self.provider = provider if provider is not None else self._provider_from_env()
         
         # System prompt especializado para Aplyfly
         self.system_prompt = """
@@ -117,83 +98,177 @@ EJEMPLOS DE RESPUESTAS:
 - SIEMPRE usa contacto@aplifly.com (con "i" en aplifly) como email de contacto
 """
 
-    def _prepare_messages(self, user_message: str, conversation_history: list = None) -> list:
+    def _provider_from_env(self):
         """
-        Prepara los mensajes para enviar a Azure OpenAI incluyendo el system prompt
+        Proveedor según CHAT_PROVIDER: 'azure' (por defecto) o 'fake' (sin red, para pruebas de carga)
         """
-        messages = [{"role": "system", "content": self.system_prompt}]
+        if os.getenv("CHAT_PROVIDER", "azure") == "fake":
+            logger.info("AplyflyChatAgent usando el proveedor simulado (CHAT_PROVIDER=fake)")
+            return chat_providers.fake_from_env()
         
-        # Agregar historial de conversación si existe
-        if conversation_history:
-            for msg in conversation_history[-10:]:  # Limitar a últimos 10 mensajes
-                if isinstance(msg, dict) and msg.get('role') and msg.get('content'):
-                    messages.append({
-                        "role": msg['role'],
-                        "content": msg['content']
-                    })
+        # Configuración de Azure OpenAI con validación
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        api_key = os.getenv("AZURE_OPENAI_API_KEY")
         
-        # Agregar mensaje actual del usuario
-        messages.append({"role": "user", "content": user_message})
+        if not endpoint or not api_key:
+            self._init_error = "Variables de entorno de Azure OpenAI no configuradas"
+            logger.warning("Variables de entorno de Azure OpenAI no configuradas, usando respuestas de fallback")
+            return None
         
+        # Inicialización robusta del cliente Azure OpenAI
+        try:
+            provider = chat_providers.AzureOpenAIProvider(
+                endpoint=endpoint,
+                api_key=api_key,
+                deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
+            )
+            logger.info(f"AplyflyChatAgent inicializado correctamente con modelo: {provider.model}")
+            return provider
+        except TypeError as te:
+            self._init_error = f"Error de compatibilidad OpenAI: {str(te)}"
+            logger.warning(f"Error de compatibilidad OpenAI: {str(te)}")
+        except Exception as ee:
+            self._init_error = f"Error general OpenAI: {str(ee)}"
+            logger.warning(f"Error general OpenAI: {str(ee)}")
+        # En producción, usar respuestas de fallback si Azure OpenAI no está disponible
+        return None
+
+    def _prepare_messages(self, user_message: str, conversation_history: list = None, summary: str = '') -> list:
+        """
+        Prepara los mensajes para enviar al modelo incluyendo el system prompt,
+        dentro del presupuesto de tokens (core.chat_prompt)
+        """
+        messages, report = build_messages(self.system_prompt, user_message, conversation_history, summary)
+        logger.info(
+            "Prompt %(total)d/%(budget)d tokens: system=%(system)d summary=%(summary)d "
+            "history=%(history)d (%(history_kept)d mensajes, %(history_dropped)d descartados) "
+            "user=%(user)d truncado=%(user_truncated)s",
+            report,
+        )
         return messages
 
-    async def get_chat_response(self, message: str, conversation_history: list = None) -> AsyncGenerator[str, None]:
+    @property
+    def prompt_version(self) -> str:
         """
-        Genera respuesta streaming del agente de IA usando Azure OpenAI
+        Huella del prompt y del modelo: cambiarlos invalida las respuestas cacheadas
         """
+        model = f"{self.provider.name}:{self.provider.model}" if self.provider else ""
+        raw = f"{self.system_prompt}|{model}|{self.temperature}|{self.max_tokens}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def _cache_key(self, message: str, messages: list) -> str:
+        # messages[1:-1]: el historial tal como se envía al modelo, sin system prompt ni mensaje actual
+        return make_key(message, messages[1:-1], self.prompt_version)
+
+    async def get_chat_response(self, message: str, conversation_history: list = None, summary: str = '') -> AsyncGenerator[str, None]:
+        """
+        Genera respuesta streaming del agente de IA con el proveedor configurado.
+        Usa el cliente async, así que esperar al modelo no bloquea el worker.
+        """
+        # Telemetría por petición (core.chat_telemetry); se registra al terminar, sin bloquear el stream
+        metrics = chat_telemetry.RequestMetrics(self.provider, streaming=True)
         try:
-            # Verificar si el cliente está disponible
-            if not self.client:
-                yield "🤖 Hola! Soy AplyBot de Aplyfly. Actualmente estamos configurando el sistema. Por favor contacta directamente a contacto@aplifly.com para una consulta inmediata."
+            # Verificar si hay un proveedor disponible
+            if not self.provider:
+                metrics.outcome = 'fallback'
+                metrics.add_output(FALLBACK_MESSAGE)
+                yield FALLBACK_MESSAGE
                 return
                 
-            messages = self._prepare_messages(message, conversation_history)
+            messages = self._prepare_messages(message, conversation_history, summary)
+            metrics.set_prompt(messages)
+            cache_key = self._cache_key(message, messages)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                metrics.outcome = 'cache'
+                metrics.add_output(cached)
+                yield cached
+                return
             
-            # Llamada streaming a Azure OpenAI
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                stream=True
-            )
+            # Llamada streaming al modelo; sin historial, la pregunta puede estar ya en curso
+            # para otro visitante y se comparte su generación
+            if self.coalesce and len(messages) == 2:
+                deltas, leader = self.single_flight.join(
+                    cache_key,
+                    lambda: self.provider.stream(messages, self.max_tokens, self.temperature),
+                )
+            else:
+                deltas, leader = self.provider.stream(messages, self.max_tokens, self.temperature), True
+            parts = []
+            async for content in deltas:
+                metrics.add_output(content)
+                parts.append(content)
+                yield content
+            metrics.outcome = 'model' if leader else 'coalesced'
             
-            # Streaming de la respuesta
-            for chunk in response:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    yield content
-                    await asyncio.sleep(0.01)  # Pequeño delay para suavizar streaming
+            # Solo se cachean respuestas completas (no cortadas ni de error)
+            if parts:
+                self.response_cache.set(cache_key, ''.join(parts))
                     
         except Exception as e:
-            logger.error(f"Error en Azure OpenAI streaming: {str(e)}")
-            yield f"🤖 Disculpa, hubo un error técnico. Por favor contacta directamente a contacto@aplifly.com para una respuesta inmediata. Estamos aquí para ayudarte! 🔧"
+            metrics.outcome = 'error'
+            logger.error(f"Error en el proveedor ({self.provider.name}) streaming: {str(e)}")
+            yield ERROR_MESSAGE
+        finally:
+            metrics.finish()
 
-    def get_response_sync(self, message: str, conversation_history: list = None) -> str:
+    def get_response_sync(self, message: str, conversation_history: list = None, summary: str = '') -> str:
         """
         Versión síncrona para casos donde no se necesita streaming
         """
+        metrics = chat_telemetry.RequestMetrics(self.provider, streaming=False)
         try:
-            # Verificar si el cliente está disponible
-            if not self.client:
-                return "🤖 Hola! Soy AplyBot de Aplyfly. Actualmente estamos configurando el sistema. Por favor contacta directamente a contacto@aplifly.com para una consulta inmediata."
+            # Verificar si hay un proveedor disponible
+            if not self.provider:
+                metrics.outcome = 'fallback'
+                metrics.add_output(FALLBACK_MESSAGE)
+                return FALLBACK_MESSAGE
                 
-            messages = self._prepare_messages(message, conversation_history)
-            
-            # Llamada síncrona a Azure OpenAI
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                stream=False
-            )
+            messages = self._prepare_messages(message, conversation_history, summary)
+            metrics.set_prompt(messages)
+            cache_key = self._cache_key(message, messages)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                metrics.outcome = 'cache'
+                metrics.add_output(cached)
+                return cached
             
-            return response.choices[0].message.content
+            # Llamada síncrona al modelo
+            answer = self.provider.complete(messages, self.max_tokens, self.temperature)
+            metrics.outcome = 'model'
+            if answer:
+                metrics.add_output(answer)
+                self.response_cache.set(cache_key, answer)
+            return answer
             
         except Exception as e:
-            logger.error(f"Error en Azure OpenAI sync: {str(e)}")
-            return "🤖 Disculpa, hubo un error técnico. Por favor contacta directamente a contacto@aplifly.com para una respuesta inmediata. Estamos aquí para ayudarte! 🔧"
+            metrics.outcome = 'error'
+            logger.error(f"Error en el proveedor ({self.provider.name}) sync: {str(e)}")
+            return ERROR_MESSAGE
+        finally:
+            metrics.finish()
+
+# Instancia global del agente, creada en el primer uso: importar este módulo
+# (vistas, comandos de manage.py) no carga openai ni crea clientes HTTP
+_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_agent() -> AplyflyChatAgent:
+    """
+    Devuelve el agente global, construyéndolo una sola vez aunque lo pidan varios hilos a la vez
+    """
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = AplyflyChatAgent()
+    return _agent
+
 
-# Instancia global del agente
-aplyfly_agent = AplyflyChatAgent()
+def __getattr__(name):
+    # Compatibilidad con `from core.ai_agent import aplyfly_agent`
+    if name == 'aplyfly_agent':
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,129 @@
+"""
+Page cache for the public blog.
+
+Cached pages are keyed by a content version: the post's ``updated_at`` plus a
+global blog version that is bumped whenever a ``BlogPost`` or ``BlogCategory``
+is saved or deleted (related posts, categories and sidebars live on every
+page). Old entries are never invalidated explicitly, they simply stop being
+looked up and expire.
+
+A bump only reaches the processes that share the cache. With a per-process
+cache (LocMem) and several workers ``BLOG_CACHE_SHARED`` is False: pages and
+the sidebar are rendered fresh and served without version-based validators.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'blog:version'
+NEWS_VERSION_KEY = 'blog:news-version'
+PAGE_CACHE_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+SIDEBAR_TIMEOUT = getattr(settings, 'BLOG_SIDEBAR_TIMEOUT', 60 * 5)
+SHARED = getattr(settings, 'BLOG_CACHE_SHARED', True)
+SIDEBAR_SIZE = 5
+TAG_CLOUD_SIZE = 20
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # A fresh timestamp can never collide with a version used before eviction
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def blog_version():
+    """Current global blog version (a timestamp in nanoseconds)"""
+    return _version(VERSION_KEY)
+
+
+def bump_blog_version():
+    """Invalidate every cached blog page"""
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def news_version():
+    """Version of the Google News sitemap, bumped only when a news post changes"""
+    return _version(NEWS_VERSION_KEY)
+
+
+def bump_news_version():
+    cache.set(NEWS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+
+def detail_stamp(slug):
+    """``(post_id, updated_at)`` of a visible post, one indexed lookup, or None"""
+    from .models import BlogPost
+
+    return BlogPost.objects.visible().filter(
+        slug=slug
+    ).values_list('id', 'updated_at').first()
+
+
+def detail_validators(slug, updated_at):
+    """ETag and Last-Modified for a post detail page"""
+    version = blog_version()
+    digest = hashlib.md5(f'{slug}:{updated_at.isoformat()}:{version}'.encode()).hexdigest()
+    last_modified = max(updated_at, version_datetime(version))
+    return f'"{digest}"', last_modified
+
+
+def page_key(request, etag):
+    # Absolute URLs in the page depend on scheme and host
+    origin = f'{request.scheme}://{request.get_host()}'
+    digest = hashlib.md5(f'{origin}:{request.path}:{etag}'.encode()).hexdigest()
+    return f'blog:page:{digest}'
+
+
+def get_page(key):
+    return cache.get(key)
+
+
+def set_page(key, content):
+    cache.set(key, content, PAGE_CACHE_TIMEOUT)
+
+
+def _build_sidebar():
+    from .models import BlogCategory, BlogPost, Tag
+
+    published = BlogPost.objects.visible().listing()
+    return {
+        'categories': list(BlogCategory.objects.all()),
+        # One extra so the detail page can leave out the post being read
+        'recent_posts': list(published.order_by('-published_at')[:SIDEBAR_SIZE + 1]),
+        'popular_posts': list(published.order_by('-views_count')[:SIDEBAR_SIZE]),
+        'tag_cloud': list(Tag.objects.filter(post_count__gt=0).order_by('-post_count', 'name')[:TAG_CLOUD_SIZE]),
+    }
+
+
+def sidebar(exclude_post_id=None):
+    """
+    Categories, recent/popular posts and tag cloud shared by every blog page.
+
+    Rebuilt when the blog version changes (a post or category is saved) and
+    at least every ``BLOG_SIDEBAR_TIMEOUT`` seconds so the popularity ranking
+    follows the view counter. Not cached without a shared cache.
+    """
+    if SHARED:
+        key = f'blog:sidebar:{blog_version()}'
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = _build_sidebar()
+            cache.set(key, snapshot, SIDEBAR_TIMEOUT)
+    else:
+        snapshot = _build_sidebar()
+    recent_posts = [post for post in snapshot['recent_posts'] if post.pk != exclude_post_id]
+    return {
+        'categories': snapshot['categories'],
+        'recent_posts': recent_posts[:SIDEBAR_SIZE],
+        'popular_posts': snapshot['popular_posts'],
+        'tag_cloud': snapshot['tag_cloud'],
+    }
@@ -0,0 +1,118 @@
+"""
+RSS and Atom feeds for the blog.
+
+Feeds are built from the listing projection and their rendered body is
+cached under a stamp of the feed's posts read from the database (count and
+newest ``published_at``/``updated_at``, one aggregate query), so publishing,
+editing or deleting a post rebuilds them on every worker, including posts
+made visible by the cron job. Feed readers polling in between cost that
+query and one cache lookup. Responses carry an ETag of the body and the
+Last-Modified of the newest entry.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date_safe
+from .models import BlogPost
+
+FEED_SIZE = getattr(settings, 'BLOG_FEED_SIZE', 20)
+FEED_MAX_AGE = getattr(settings, 'BLOG_FEED_MAX_AGE', 60 * 15)
+# Category renames are not in the stamp, they show up when the entry expires
+FEED_CACHE_TIMEOUT = getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 60 * 60)
+
+
+class LatestPostsFeed(Feed):
+    title = 'Blog de Tecnología e Innovación - Aplyfly'
+    link = reverse_lazy('blog:list')
+    description = 'Artículos sobre IA, agentes empresariales, desarrollo y transformación digital'
+    language = 'es'
+
+    def posts(self):
+        return BlogPost.objects.visible().select_related('category').listing()
+
+    def stamp(self):
+        """Changes whenever a post enters, leaves or is edited in the feed"""
+        stats = self.posts().order_by().aggregate(
+            total=Count('id'), published=Max('published_at'), updated=Max('updated_at'),
+        )
+        return f"{stats['total']}:{stats['published']}:{stats['updated']}"
+
+    def items(self):
+        return self.posts().order_by('-published_at', '-id')[:FEED_SIZE]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_pubdate(self, item):
+        return item.published_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return [item.category.name] if item.category else []
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class NewsFeed(LatestPostsFeed):
+    title = 'Aplyfly Tech News'
+    description = 'Noticias de tecnología e inteligencia artificial de Aplyfly'
+
+    def posts(self):
+        return super().posts().filter(is_news=True)
+
+
+class NewsAtomFeed(NewsFeed):
+    feed_type = Atom1Feed
+    subtitle = NewsFeed.description
+
+
+def cached_feed(feed_class):
+    """View serving ``feed_class`` from the cache, with conditional GET"""
+    feed = feed_class()
+
+    def view(request):
+        # Links in the feed are absolute, so the body depends on scheme and host
+        origin = f'{request.scheme}://{request.get_host()}'
+        digest = hashlib.md5(f'{origin}:{feed_class.__name__}:{feed.stamp()}'.encode()).hexdigest()
+        key = f'blog:feed:{digest}'
+        entry = cache.get(key)
+        if entry is None:
+            response = feed(request)
+            entry = (
+                response.content,
+                response['Content-Type'],
+                f'"{hashlib.md5(response.content).hexdigest()}"',
+                response.get('Last-Modified'),
+            )
+            cache.set(key, entry, FEED_CACHE_TIMEOUT)
+        content, content_type, etag, last_modified = entry
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        patch_cache_control(response, public=True, max_age=FEED_MAX_AGE)
+        return response
+
+    return view
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination for blog listings.
+
+Pages are addressed by the ``(published_at, id)`` of their first or last post
+instead of a page number, so there is no ``COUNT(*)`` and no ``OFFSET``: every
+page is one range scan on the ``(is_visible, -published_at, -id)`` index.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 12
+
+
+def encode_cursor(post):
+    raw = f'{post.published_at.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """``(published_at, id)`` from a cursor, or None if it is malformed"""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        published_at, pk = raw.split('|')
+        published_at = parse_datetime(published_at)
+        if published_at is None:
+            return None
+        return published_at, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """A page of posts with cursors to its neighbours (mirrors the Page API templates use)"""
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def keyset_page(posts, params, per_page=PER_PAGE):
+    """Page of ``posts`` (newest first) selected by the ``after``/``before`` cursor in ``params``"""
+    posts = posts.order_by('-published_at', '-id')
+
+    before = decode_cursor(params.get('before'))
+    if before:
+        published_at, pk = before
+        rows = list(posts.filter(
+            Q(published_at__gt=published_at) | Q(published_at=published_at, id__gt=pk)
+        ).order_by('published_at', 'id')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=encode_cursor(rows[0]) if has_previous else None,
+        )
+
+    after = decode_cursor(params.get('after'))
+    if after:
+        published_at, pk = after
+        posts = posts.filter(
+            Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=pk)
+        )
+    rows = list(posts[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(rows[0]) if after and rows else None,
+    )
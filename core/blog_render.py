@@ -0,0 +1,134 @@
+"""
+Save-time render stage for blog articles.
+
+``BlogPost.content`` is the HTML written in the admin. ``render_article`` turns
+it into the HTML the detail page serves: images get ``loading="lazy"`` and
+``decoding="async"``, ``h2``/``h3`` headings get anchor ids, and a table of
+contents, word count and reading time are collected in the same pass.
+"""
+from collections import namedtuple
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from django.utils.text import slugify
+
+WORDS_PER_MINUTE = 200
+TOC_LEVELS = ('h2', 'h3')
+
+RenderedArticle = namedtuple('RenderedArticle', ['html', 'toc', 'word_count', 'reading_time'])
+
+
+def _start_tag(tag, attrs, self_closing=False):
+    parts = [tag]
+    for name, value in attrs:
+        parts.append(name if value is None else f'{name}="{escape(value, quote=True)}"')
+    return '<{}{}>'.format(' '.join(parts), ' /' if self_closing else '')
+
+
+class _ArticleRenderer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.toc = []
+        self.text = []
+        self.used_ids = set()
+        self.heading = None  # (tag, attrs, index in out, text parts)
+        self.skip_depth = 0  # inside <script>/<style>
+
+    def _image(self, attrs, self_closing):
+        names = {name for name, _ in attrs}
+        if 'loading' not in names:
+            attrs.append(('loading', 'lazy'))
+        if 'decoding' not in names:
+            attrs.append(('decoding', 'async'))
+        self.out.append(_start_tag('img', attrs, self_closing))
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            self._image(attrs, False)
+            return
+        if tag in ('script', 'style'):
+            self.skip_depth += 1
+        if tag in TOC_LEVELS and self.heading is None:
+            # Placeholder, the id depends on the heading text
+            self.heading = (tag, attrs, len(self.out), [])
+            self.out.append(None)
+            return
+        self.out.append(self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'img':
+            self._image(attrs, True)
+        else:
+            self.out.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.skip_depth:
+            self.skip_depth -= 1
+        if self.heading and tag == self.heading[0]:
+            self._close_heading()
+        self.out.append(f'</{tag}>')
+
+    def _close_heading(self):
+        tag, attrs, index, text = self.heading
+        self.heading = None
+        title = ' '.join(''.join(text).split())
+        anchor = dict(attrs).get('id')
+        if not anchor:
+            base = slugify(title) or 'seccion'
+            anchor, suffix = base, 2
+            while anchor in self.used_ids:
+                anchor, suffix = f'{base}-{suffix}', suffix + 1
+            attrs = attrs + [('id', anchor)]
+        self.used_ids.add(anchor)
+        self.out[index] = _start_tag(tag, attrs)
+        if title:
+            self.toc.append({'level': int(tag[1]), 'id': anchor, 'title': title})
+
+    def _text(self, text):
+        if self.skip_depth:
+            return
+        self.text.append(text)
+        if self.heading:
+            self.heading[3].append(text)
+
+    def handle_data(self, data):
+        self.out.append(data)
+        self._text(data)
+
+    def handle_entityref(self, name):
+        self.out.append(f'&{name};')
+        self._text(unescape(f'&{name};'))
+
+    def handle_charref(self, name):
+        self.out.append(f'&#{name};')
+        self._text(unescape(f'&#{name};'))
+
+    def handle_comment(self, data):
+        self.out.append(f'<!--{data}-->')
+
+    def handle_decl(self, decl):
+        self.out.append(f'<!{decl}>')
+
+    def handle_pi(self, data):
+        self.out.append(f'<?{data}>')
+
+    def unknown_decl(self, data):
+        self.out.append(f'<![{data}]>')
+
+
+def render_article(content):
+    """Process article HTML once, at save time"""
+    renderer = _ArticleRenderer()
+    renderer.feed(content or '')
+    renderer.close()
+    if renderer.heading:
+        renderer._close_heading()
+    # Block tags separate words even without whitespace between them
+    word_count = len(' '.join(renderer.text).split())
+    return RenderedArticle(
+        html=''.join(part for part in renderer.out if part is not None),
+        toc=renderer.toc,
+        word_count=word_count,
+        reading_time=max(1, word_count // WORDS_PER_MINUTE),
+    )
@@ -0,0 +1,157 @@
+"""
+Full-text search index for blog posts.
+
+PostgreSQL keeps a weighted ``tsvector`` in ``BlogPost.search_vector`` (GIN
+indexed, Spanish stemming). SQLite, used in local development, keeps the same
+documents in an FTS5 virtual table. Both are refreshed from ``BlogPost.save``.
+"""
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, Q, Value, When
+from django.utils.html import strip_tags
+
+SEARCH_CONFIG = 'spanish'
+FTS_TABLE = 'core_blogpost_fts'
+
+# Fields that feed the index (weights: title A, excerpt/tags B, content D)
+INDEXED_FIELDS = ('title', 'excerpt', 'tags', 'content')
+
+# bm25() column weights for the FTS5 table, same order as INDEXED_FIELDS and
+# the same tiers as search_vector() so both backends rank alike
+FTS_WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+
+def search_vector():
+    """Weighted search vector over the indexed BlogPost fields"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('excerpt', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('tags', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('content', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+def _fts_row(post_id, title, excerpt, tags, content):
+    # Index plain text so snippets never cut through article markup
+    return [post_id, title, excerpt, tags, strip_tags(content)]
+
+
+def _fts_match_expression(query):
+    """Turn free text into a safe FTS5 MATCH expression (prefix AND of terms)"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+def update_search_index(post):
+    """Refresh the index entry of a single post"""
+    from .models import BlogPost
+
+    if uses_postgres():
+        BlogPost.objects.filter(pk=post.pk).update(search_vector=search_vector())
+    elif uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, tags, content) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                _fts_row(post.pk, post.title, post.excerpt, post.tags, post.content),
+            )
+
+
+def remove_from_search_index(post_id):
+    """Drop a post from the index (Postgres rows go away with the post itself)"""
+    if uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_search_index():
+    """Rebuild the whole index from the BlogPost table"""
+    from .models import BlogPost
+
+    if uses_postgres():
+        return BlogPost.objects.update(search_vector=search_vector())
+    if uses_fts5():
+        rows = [
+            _fts_row(*values) for values in BlogPost.objects.values_list(
+                'id', 'title', 'excerpt', 'tags', 'content'
+            ).iterator()
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, tags, content) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+        return len(rows)
+    return 0
+
+
+def search_posts(posts, query):
+    """
+    Filter a BlogPost queryset by ``query`` and order it by relevance.
+
+    Every result is annotated with ``search_rank`` and ``search_snippet``
+    (HTML fragment with the matches wrapped in ``<mark>``).
+    """
+    if uses_postgres():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return posts.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+            search_snippet=SearchHeadline(
+                Func(F('content'), Value('<[^>]+>'), Value(' '), Value('g'), function='regexp_replace'),
+                search_query, config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                max_words=35, min_words=15, max_fragments=2,
+            ),
+        ).order_by('-search_rank', '-published_at')
+
+    if uses_fts5():
+        match = _fts_match_expression(query)
+        if not match:
+            return posts.none()
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        with connection.cursor() as cursor:
+            # bm25() is lower-is-better; cap the candidate set like a results page would
+            cursor.execute(
+                f'SELECT rowid, bm25({FTS_TABLE}, {weights}), '
+                f"snippet({FTS_TABLE}, 3, %s, %s, '…', 24) "
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT 500',
+                [HIGHLIGHT_START, HIGHLIGHT_STOP, match],
+            )
+            hits = cursor.fetchall()
+        if not hits:
+            return posts.none()
+        return posts.filter(pk__in=[post_id for post_id, _, _ in hits]).annotate(
+            search_rank=Case(
+                *[When(pk=post_id, then=Value(-score)) for post_id, score, _ in hits],
+                output_field=FloatField(),
+            ),
+            search_snippet=Case(
+                *[When(pk=post_id, then=Value(snippet)) for post_id, _, snippet in hits],
+                default=Value(''),
+            ),
+        ).order_by('-search_rank', '-published_at')
+
+    # Other backends: unranked substring match
+    return posts.filter(
+        Q(title__icontains=query) |
+        Q(excerpt__icontains=query) |
+        Q(content__icontains=query) |
+        Q(tags__icontains=query)
+    )
@@ -1,10 +1,15 @@
 from django.urls import path
-from . import blog_views
+from . import blog_feeds, blog_views
 
 app_name = 'blog'
 
 urlpatterns = [
     path('', blog_views.blog_list, name='list'),
     path('categoria/<slug:slug>/', blog_views.blog_category, name='category'),
+    path('parcial/tarjetas/', blog_views.blog_cards, name='cards'),
+    path('feed/', blog_feeds.cached_feed(blog_feeds.LatestPostsFeed), name='feed_rss'),
+    path('feed/atom/', blog_feeds.cached_feed(blog_feeds.LatestPostsAtomFeed), name='feed_atom'),
+    path('feed/noticias/', blog_feeds.cached_feed(blog_feeds.NewsFeed), name='news_feed_rss'),
+    path('feed/noticias/atom/', blog_feeds.cached_feed(blog_feeds.NewsAtomFeed), name='news_feed_atom'),
     path('<slug:slug>/', blog_views.blog_detail, name='post_detail'),
 ]
@@ -1,103 +1,138 @@
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.utils import timezone
+from django.http import Http404, HttpResponse
+from django.utils.text import slugify
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from . import blog_cache, view_counter
+from .blog_pagination import PER_PAGE, keyset_page
 from .models import BlogPost, BlogCategory
+from .blog_search import search_posts
 
 
-def blog_list(request):
-    """Blog list view with pagination and filters"""
-    posts = BlogPost.objects.filter(status='published', published_at__lte=timezone.now()).select_related('author', 'category')
+def _filtered_posts(request):
+    """Published posts narrowed by the category/tag/search query parameters"""
+    posts = BlogPost.objects.visible().select_related('category').listing()
+    filters = {}
     
     # Category filter
     category_slug = request.GET.get('category')
     if category_slug:
         posts = posts.filter(category__slug=category_slug)
+        filters['category'] = category_slug
     
-    # Tag filter
+    # Tag filter (exact match through the tag index)
     tag = request.GET.get('tag')
     if tag:
-        posts = posts.filter(tags__icontains=tag)
+        posts = posts.filter(tag_set__slug=slugify(tag))
+        filters['tag'] = tag
     
-    # Search
-    search_query = request.GET.get('search')
+    # Search (ranked by relevance, with highlighted snippets)
+    search_query = request.GET.get('search', '').strip()
     if search_query:
-        posts = posts.filter(
-            Q(title__icontains=search_query) |
-            Q(excerpt__icontains=search_query) |
-            Q(content__icontains=search_query) |
-            Q(tags__icontains=search_query)
-        )
+        posts = search_posts(posts, search_query)
+        filters['search'] = search_query
+    
+    return posts, filters
+
+
+def _paginate(request, posts, keyset=True):
+    """Keyset page by default; numbered pages for ranked search results and legacy ?page= links"""
+    if keyset and 'page' not in request.GET:
+        return keyset_page(posts, request.GET)
+    paginator = Paginator(posts, PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def blog_list(request):
+    """Blog list view with pagination and filters"""
+    posts, filters = _filtered_posts(request)
     
     # Pagination
-    paginator = Paginator(posts, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _paginate(request, posts, keyset='search' not in filters)
     
-    # Categories for sidebar
-    categories = BlogCategory.objects.all()
+    # Categories, recent and popular posts for sidebar (shared snapshot)
+    sidebar = blog_cache.sidebar()
     
-    # Recent posts for sidebar
-    recent_posts = BlogPost.objects.filter(
-        status='published', 
-        published_at__lte=timezone.now()
-    ).order_by('-published_at')[:5]
+    context = {
+        'page_obj': page_obj,
+        'categories': sidebar['categories'],
+        'recent_posts': sidebar['recent_posts'],
+        'popular_posts': sidebar['popular_posts'],
+        'tag_cloud': sidebar['tag_cloud'],
+        'search_query': filters.get('search', ''),
+        'current_category': filters.get('category'),
+        'current_tag': filters.get('tag'),
+        'filter_query': urlencode(filters),
+    }
     
-    # Popular posts
-    popular_posts = BlogPost.objects.filter(
-        status='published',
-        published_at__lte=timezone.now()
-    ).order_by('-views_count')[:5]
+    return render(request, 'blog/list.html', context)
+
+
+def blog_cards(request):
+    """HTMX infinite scroll: the next page of post cards only"""
+    posts, filters = _filtered_posts(request)
+    page_obj = keyset_page(posts, request.GET)
     
     context = {
         'page_obj': page_obj,
-        'categories': categories,
-        'recent_posts': recent_posts,
-        'popular_posts': popular_posts,
-        'search_query': search_query,
-        'current_category': category_slug,
-        'current_tag': tag,
+        'filter_query': urlencode(filters),
     }
     
-    return render(request, 'blog/list.html', context)
+    return render(request, 'blog/_post_cards.html', context)
 
 
 def blog_detail(request, slug):
-    """Blog post detail view with SEO optimization"""
-    post = get_object_or_404(
-        BlogPost.objects.select_related('author', 'category'),
-        slug=slug,
-        status='published',
-        published_at__lte=timezone.now()
-    )
-    
-    # Increment views
-    post.increment_views()
-    
-    # Related posts
-    related_posts = post.related_posts.filter(
-        status='published',
-        published_at__lte=timezone.now()
-    )[:3]
-    
-    # If no related posts, get from same category
-    if not related_posts.exists() and post.category:
-        related_posts = BlogPost.objects.filter(
-            category=post.category,
-            status='published',
-            published_at__lte=timezone.now()
-        ).exclude(id=post.id)[:3]
-    
-    # Recent posts for sidebar
-    recent_posts = BlogPost.objects.filter(
-        status='published',
-        published_at__lte=timezone.now()
-    ).exclude(id=post.id).order_by('-published_at')[:5]
+    """Blog post detail view with SEO optimization (page cached per content version)"""
+    stamp = blog_cache.detail_stamp(slug)
+    if stamp is None:
+        raise Http404('No BlogPost matches the given query.')
+    post_id, updated_at = stamp
+    
+    # Increment views (buffered, also counted for 304s and cached pages)
+    view_counter.record_view(post_id)
+    
+    if not blog_cache.SHARED:
+        # Per-worker cache: a version bump would not reach the other workers
+        return _render_blog_detail(request, post_id)
+    
+    etag, last_modified = blog_cache.detail_validators(slug, updated_at)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if not_modified is not None:
+        return not_modified
+    
+    cacheable = not request.user.is_authenticated
+    cache_key = blog_cache.page_key(request, etag)
+    content = blog_cache.get_page(cache_key) if cacheable else None
+    if content is not None:
+        response = HttpResponse(content)
+    else:
+        response = _render_blog_detail(request, post_id)
+        if cacheable:
+            blog_cache.set_page(cache_key, response.content)
+    
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+def _render_blog_detail(request, post_id):
+    # Served from the pre-rendered artifact, the raw body is not needed
+    post = BlogPost.objects.select_related('author', 'category').defer('content', 'search_vector').get(pk=post_id)
+    
+    # Related posts (curated first, then precomputed TF-IDF neighbours)
+    related_posts = BlogPost.objects.visible().filter(
+        neighbour_of__post=post
+    ).listing().order_by('neighbour_of__rank')[:3]
+    
+    # Recent posts for sidebar (shared snapshot)
+    sidebar = blog_cache.sidebar(exclude_post_id=post.id)
     
     context = {
         'post': post,
         'related_posts': related_posts,
-        'recent_posts': recent_posts,
+        'recent_posts': sidebar['recent_posts'],
     }
     
     return render(request, 'blog/detail.html', context)
@@ -106,24 +141,22 @@ def blog_detail(request, slug):
 def blog_category(request, slug):
     """Category view"""
     category = get_object_or_404(BlogCategory, slug=slug)
-    posts = BlogPost.objects.filter(
-        category=category,
-        status='published',
-        published_at__lte=timezone.now()
-    ).select_related('author', 'category')
+    posts = BlogPost.objects.visible().filter(
+        category=category
+    ).select_related('category').listing()
     
     # Pagination
-    paginator = Paginator(posts, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _paginate(request, posts)
     
-    # Categories for sidebar
-    categories = BlogCategory.objects.all()
+    # Categories for sidebar (shared snapshot)
+    sidebar = blog_cache.sidebar()
     
     context = {
         'category': category,
         'page_obj': page_obj,
-        'categories': categories,
+        'categories': sidebar['categories'],
+        'recent_posts': sidebar['recent_posts'],
+        'popular_posts': sidebar['popular_posts'],
     }
     
     return render(request, 'blog/category.html', context)
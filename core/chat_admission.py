@@ -0,0 +1,230 @@
+"""
+Admission control for the AplyBot chat API.
+
+Two independent checks run before a chat request reaches the model:
+
+* a per-client-IP quota over a sliding window (``CHAT_IP_QUOTA`` requests per
+  ``CHAT_IP_WINDOW`` seconds), counted in the cache so it is shared between
+  workers when Redis is configured. The window is approximated with the
+  usual two-bucket weighting: the previous fixed window counts in proportion
+  to how much of it still overlaps the sliding one.
+* a per-worker cap on model calls in flight (``CHAT_MAX_IN_FLIGHT``). Past
+  the cap, up to ``CHAT_QUEUE_SIZE`` requests wait at most
+  ``CHAT_QUEUE_TIMEOUT`` seconds for a slot, in arrival order; the rest are
+  turned away at once.
+
+Rejected requests get a 429 with ``Retry-After``. The controller is not tied
+to an event loop (``runserver`` runs each async view in its own loop), so
+slots are handed to waiters with ``call_soon_threadsafe``. ``stats()`` exposes
+queue depth and rejection counters (``/api/chat/test/``).
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+MAX_IN_FLIGHT = getattr(settings, 'CHAT_MAX_IN_FLIGHT', 8)
+QUEUE_SIZE = getattr(settings, 'CHAT_QUEUE_SIZE', 16)
+QUEUE_TIMEOUT = getattr(settings, 'CHAT_QUEUE_TIMEOUT', 5)
+IP_QUOTA = getattr(settings, 'CHAT_IP_QUOTA', 20)
+IP_WINDOW = getattr(settings, 'CHAT_IP_WINDOW', 60)
+PROXY_COUNT = getattr(settings, 'CHAT_PROXY_COUNT', 0)
+
+QUOTA_KEY_PREFIX = 'chat:quota:'
+
+REJECT_MESSAGES = {
+    'quota': 'Has enviado demasiados mensajes seguidos. Espera un momento antes de continuar.',
+    'queue_full': 'AplyBot está atendiendo muchas conversaciones ahora mismo. Inténtalo de nuevo en unos segundos.',
+    'queue_timeout': 'AplyBot está atendiendo muchas conversaciones ahora mismo. Inténtalo de nuevo en unos segundos.',
+}
+
+
+def client_ip(request):
+    """
+    Client address. Behind ``CHAT_PROXY_COUNT`` trusted proxies it is the entry
+    that many places from the right of X-Forwarded-For (the left ones are
+    client-supplied and can be forged).
+    """
+    if PROXY_COUNT:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if forwarded:
+            return forwarded[-min(PROXY_COUNT, len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class IPQuota:
+    """Sliding-window request quota per IP, stored in the cache"""
+
+    def __init__(self, limit=IP_QUOTA, window=IP_WINDOW):
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, ip, bucket):
+        return f'{QUOTA_KEY_PREFIX}{ip}:{bucket}', f'{QUOTA_KEY_PREFIX}{ip}:{bucket - 1}'
+
+    async def check(self, ip, now=None):
+        """
+        Count one request from ``ip``. Returns ``None`` if it is within the
+        quota, otherwise the seconds until it would be.
+        """
+        if self.limit <= 0:
+            return None
+        now = time.time() if now is None else now
+        bucket, offset = divmod(now, self.window)
+        bucket = int(bucket)
+        current_key, previous_key = self._keys(ip, bucket)
+        counts = await cache.aget_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+        overlap = 1 - offset / self.window
+
+        if previous * overlap + current >= self.limit:
+            if current >= self.limit:
+                wait = self.window - offset
+            else:
+                # Until enough of the previous window has slid out
+                wait = self.window * (1 - (self.limit - current) / previous) - offset
+            return max(1, math.ceil(wait))
+
+        # Buckets live for two windows: one as current, one as previous
+        if not await cache.aadd(current_key, 1, timeout=2 * self.window):
+            try:
+                await cache.aincr(current_key)
+            except ValueError:
+                await cache.aset(current_key, 1, timeout=2 * self.window)
+        return None
+
+
+class _Waiter:
+    __slots__ = ('loop', 'future', 'granted')
+
+    def __init__(self, loop, future):
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """Bounded concurrency with a short FIFO wait queue; one per worker process"""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, queue_size=QUEUE_SIZE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.peak_queue_depth = 0
+        self.rejected = {'quota': 0, 'queue_full': 0, 'queue_timeout': 0}
+
+    async def acquire(self):
+        """
+        Take a slot. Returns ``None`` once admitted (the caller must
+        ``release()``), otherwise the rejection reason.
+        """
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self.queue_size:
+                self.rejected['queue_full'] += 1
+                return 'queue_full'
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop, loop.create_future())
+            self._waiters.append(waiter)
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client gone while queued: give back a slot handed over in the meantime
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()
+            raise
+
+        with self._lock:
+            # ``granted`` is set under the lock by release(): it decides, not the future,
+            # so a slot handed over just as the wait timed out is not lost
+            if waiter.granted:
+                self.admitted += 1
+                return None
+            self._waiters.remove(waiter)
+            self.rejected['queue_timeout'] += 1
+            return 'queue_timeout'
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest waiter if there is one"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    # Its event loop is closed: nobody is waiting there any more
+                    continue
+                waiter.granted = True
+                return
+            self.in_flight -= 1
+
+    def reject_quota(self):
+        with self._lock:
+            self.rejected['quota'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'queue_depth': len(self._waiters),
+                'queue_size': self.queue_size,
+                'peak_queue_depth': self.peak_queue_depth,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': dict(self.rejected),
+            }
+
+
+controller = AdmissionController()
+quota = IPQuota()
+
+
+def too_many_requests(reason, retry_after):
+    response = JsonResponse({'error': REJECT_MESSAGES[reason], 'reason': reason}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+async def admit(request):
+    """
+    Run both checks for ``request``. Returns ``None`` once admitted (the
+    caller must ``controller.release()`` when the model call ends), otherwise
+    the 429 response to send.
+    """
+    retry_after = await quota.check(client_ip(request))
+    if retry_after is not None:
+        controller.reject_quota()
+        return too_many_requests('quota', retry_after)
+    reason = await controller.acquire()
+    if reason is not None:
+        return too_many_requests(reason, max(1, math.ceil(controller.queue_timeout)))
+    return None
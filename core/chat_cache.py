@@ -0,0 +1,90 @@
+"""
+Response cache for AplyBot.
+
+Most chats open with the same few questions and no history, so complete
+answers are kept in an in-process LRU with a TTL. The key combines the
+normalized message, a digest of the history sent to the model and the
+prompt/model version, so changing the system prompt or deployment never
+serves stale answers. Each worker has its own cache; ``stats()`` reports the
+hit rate (exposed by ``/api/chat/test/``).
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SPACES = re.compile(r'\s+')
+# Leading/trailing punctuation does not change the question ("¿precios?" == "precios")
+_EDGE_PUNCTUATION = '¿?¡!.,;: '
+
+
+def normalize_message(message):
+    """Case, accents, spacing and edge punctuation folded ("¿Qué  servicios?" == "que servicios")"""
+    text = unicodedata.normalize('NFKD', message.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SPACES.sub(' ', text).strip(_EDGE_PUNCTUATION)
+
+
+def make_key(message, history, version):
+    """Cache key for ``message`` after ``history`` (the role/content dicts sent to the model)"""
+    raw = json.dumps(
+        [version, [(m['role'], m['content']) for m in history], normalize_message(message)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU of complete answers with a time-to-live"""
+
+    def __init__(self, max_entries=256, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, answer):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,124 @@
+"""
+Single-flight coalescing of identical AplyBot requests.
+
+When many visitors send the same opening message at once, only the first
+(the leader) calls the model. Requests that arrive while that generation is
+running (followers) subscribe to it. Identical means the same cache key
+(normalized message, prompt/model version) and no history or summary.
+
+The generation runs in its own task and appends each delta to a shared
+buffer. Every subscriber reads the buffer from the start at its own pace,
+so a follower that joins late gets what was already generated and then the
+live stream. The task is cancelled if every subscriber disconnects before it
+ends. Flights are per event loop: one per worker under ASGI.
+"""
+import asyncio
+import threading
+
+from .chat_providers import ProviderError
+
+
+class Flight:
+    """One upstream generation and the fan-out buffer its subscribers read"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event; later waits use a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def run(self, deltas):
+        try:
+            async for delta in deltas:
+                self.chunks.append(delta)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self, on_leave):
+        # Counted by SingleFlight.join(), so a follower that has not started
+        # reading yet still keeps the generation alive
+        try:
+            index = 0
+            while True:
+                if index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                elif self.done:
+                    if self.error is not None:
+                        # Each subscriber gets its own exception
+                        raise ProviderError(f'Generación compartida fallida: {self.error!r}') from self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done:
+                on_leave(self)
+
+
+class SingleFlight:
+    """Registry of in-flight generations by key, per event loop"""
+
+    def __init__(self):
+        self._flights = {}  # (loop, key) -> Flight
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key, start):
+        """
+        ``(deltas, leader)``: an async iterator over the generation for
+        ``key`` and whether this call started it. ``start()`` returns the
+        upstream async iterator and is only called by the leader.
+        """
+        flight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            # A finished flight waiting to be forgotten is not joined: its answer is in the cache
+            leader = flight is None or flight.done
+            if leader:
+                flight = self._flights[flight_key] = Flight()
+                self.leaders += 1
+            else:
+                self.followers += 1
+            flight.subscribers += 1
+
+        if leader:
+            flight.task = asyncio.ensure_future(flight.run(start()))
+            flight.task.add_done_callback(lambda task: self._forget(flight_key, flight))
+
+        def abandon(abandoned):
+            # Nobody is reading any more: stop the upstream call
+            self._forget(flight_key, abandoned)
+            abandoned.task.cancel()
+
+        return flight.subscribe(abandon), leader
+
+    def _forget(self, flight_key, flight):
+        with self._lock:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+
+    def stats(self):
+        with self._lock:
+            joined = self.leaders + self.followers
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'coalesced_rate': round(self.followers / joined, 4) if joined else 0.0,
+            }
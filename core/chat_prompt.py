@@ -0,0 +1,135 @@
+"""
+Token-budgeted prompt assembly for AplyBot.
+
+Token counts are estimated from text length (no tokenizer dependency; good
+enough to budget, not to bill). The prompt is filled in priority order:
+system prompt, the new user message (cut if it alone exceeds
+``CHAT_MESSAGE_TOKEN_LIMIT``), the running summary of older turns and then as
+many recent messages as fit in ``CHAT_PROMPT_TOKEN_BUDGET``, newest first.
+
+Turns that leave the recent window are folded into the conversation's
+running summary (``ChatConversation.prompt_history``), a cheap extractive
+digest kept on the conversation so it is built incrementally, never from
+the whole transcript.
+"""
+import math
+
+from django.conf import settings
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators per chat message
+SUMMARY_LINE_CHARS = 160
+
+ROLE_LABELS = {'user': 'Usuario', 'assistant': 'AplyBot'}
+TRUNCATION_MARK = ' […]'
+
+
+# Budgets are read on every call so ``override_settings`` applies
+def prompt_token_budget():
+    return getattr(settings, 'CHAT_PROMPT_TOKEN_BUDGET', 2500)
+
+
+def message_token_limit():
+    return getattr(settings, 'CHAT_MESSAGE_TOKEN_LIMIT', 600)
+
+
+def history_token_budget():
+    return getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 1200)
+
+
+def summary_token_limit():
+    return getattr(settings, 'CHAT_SUMMARY_TOKEN_LIMIT', 300)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - len(TRUNCATION_MARK)].rstrip() + TRUNCATION_MARK
+
+
+def newest_fitting(messages, budget):
+    """How many of the newest ``messages`` fit in ``budget`` tokens"""
+    used = count = 0
+    for message in reversed(messages):
+        used += message_tokens(message)
+        if used > budget:
+            break
+        count += 1
+    return count
+
+
+def fold_into_summary(summary, messages, max_tokens=None):
+    """Running summary with ``messages`` appended, dropping its oldest lines past ``max_tokens``"""
+    if max_tokens is None:
+        max_tokens = summary_token_limit()
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        text = ' '.join(message['content'].split())
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS].rstrip() + '…'
+        lines.append(f"{ROLE_LABELS.get(message['role'], message['role'])}: {text}")
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def build_messages(system_prompt, user_message, history=None, summary='', budget=None):
+    """
+    Chat messages for the model within ``budget`` estimated tokens
+    (``CHAT_PROMPT_TOKEN_BUDGET`` by default).
+
+    Returns ``(messages, report)``; ``report`` records each budget decision
+    so the caller can log it.
+    """
+    if budget is None:
+        budget = prompt_token_budget()
+    message_limit = message_token_limit()
+    report = {'budget': budget}
+    messages = [{'role': 'system', 'content': system_prompt}]
+    used = report['system'] = message_tokens(messages[0])
+
+    user_content = truncate_to_tokens(user_message, message_limit)
+    report['user_truncated'] = user_content != user_message
+    user = {'role': 'user', 'content': user_content}
+    report['user'] = message_tokens(user)
+    used += report['user']
+
+    report['summary'] = 0
+    if summary:
+        summary_message = {
+            'role': 'system',
+            'content': f'Resumen de la conversación anterior:\n{summary}',
+        }
+        summary_tokens = message_tokens(summary_message)
+        if used + summary_tokens <= budget:
+            messages.append(summary_message)
+            used += summary_tokens
+            report['summary'] = summary_tokens
+
+    history = [
+        {'role': m['role'], 'content': truncate_to_tokens(m['content'], message_limit)}
+        for m in history or []
+        if isinstance(m, dict) and m.get('role') and m.get('content')
+    ]
+    kept = newest_fitting(history, max(0, budget - used))
+    recent = history[len(history) - kept:] if kept else []
+    messages += recent
+    history_tokens = sum(message_tokens(m) for m in recent)
+    report.update(
+        history_kept=kept,
+        history_dropped=len(history) - kept,
+        history=history_tokens,
+        total=used + history_tokens,
+    )
+
+    messages.append(user)
+    return messages, report
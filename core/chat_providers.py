@@ -0,0 +1,153 @@
+"""
+Model providers for AplyBot.
+
+``AplyflyChatAgent`` talks to the model through a provider: an object with
+``stream()`` (async iterator of text deltas) and ``complete()`` (the whole
+answer, blocking). Two are included:
+
+* ``AzureOpenAIProvider``, the production one.
+* ``FakeProvider``, an offline stand-in with a configurable first-token
+  latency, token rate and error rate, used to measure the chat pipeline
+  itself (``manage.py load_test_chat``) or to run the site without Azure
+  credentials. Select it with ``CHAT_PROVIDER=fake``.
+"""
+import asyncio
+import os
+import random
+import time
+import weakref
+from abc import ABC, abstractmethod
+
+
+class ProviderError(Exception):
+    """The provider failed to produce an answer"""
+
+
+class ChatProvider(ABC):
+    """Interface of a chat model provider"""
+
+    name = ''
+    model = ''
+
+    @abstractmethod
+    async def stream(self, messages, max_tokens, temperature):
+        """Yield the answer to ``messages`` as text deltas (an async generator)"""
+
+    @abstractmethod
+    def complete(self, messages, max_tokens, temperature):
+        """Return the whole answer to ``messages``"""
+
+
+class AzureOpenAIProvider(ChatProvider):
+    name = 'azure'
+
+    def __init__(self, endpoint, api_key, deployment, api_version='2024-08-01-preview'):
+        # Imported here: openai is only loaded when the chat is first used
+        from openai import AzureOpenAI
+
+        self.model = deployment
+        self._client_options = {
+            'api_version': api_version,
+            'azure_endpoint': endpoint,
+            'api_key': api_key,
+        }
+        self.client = AzureOpenAI(**self._client_options)
+        # One async client per event loop: httpx binds its connection pool to the loop
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncAzureOpenAI
+
+            client = AsyncAzureOpenAI(**self._client_options)
+            self._async_clients[loop] = client
+        return client
+
+    async def stream(self, messages, max_tokens, temperature):
+        response = await self._get_async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def complete(self, messages, max_tokens, temperature):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=False,
+        )
+        return response.choices[0].message.content
+
+
+class FakeProvider(ChatProvider):
+    """
+    Streams a canned answer without any network access.
+
+    The first token arrives after ``first_token_latency`` seconds and the rest
+    at ``tokens_per_second``; ``reply_tokens`` words are sent (capped by
+    ``max_tokens``). With probability ``error_rate`` a request fails with
+    ``ProviderError``, at a random point of the stream.
+    """
+
+    name = 'fake'
+    model = 'fake'
+    WORDS = (
+        'En Aplyfly desarrollamos software a medida, aplicaciones web y móviles, '
+        'agentes de inteligencia artificial e integraciones para empresas. '
+        '¿Te gustaría agendar una consulta gratuita de 30 minutos? 🚀'
+    ).split()
+
+    def __init__(self, tokens_per_second=50.0, first_token_latency=0.3, error_rate=0.0, reply_tokens=80, seed=None):
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.error_rate = error_rate
+        self.reply_tokens = reply_tokens
+        self._random = random.Random(seed)
+
+    def _plan(self, max_tokens):
+        """``(tokens, failing_index)``: the deltas to send and where to fail (``None``: never)"""
+        count = max(1, min(self.reply_tokens, max_tokens or self.reply_tokens))
+        tokens = [self.WORDS[i % len(self.WORDS)] + ' ' for i in range(count)]
+        failing = self._random.randrange(count + 1) if self._random.random() < self.error_rate else None
+        return tokens, failing
+
+    def _delay(self, index):
+        if index == 0:
+            return self.first_token_latency
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+    async def stream(self, messages, max_tokens, temperature):
+        tokens, failing = self._plan(max_tokens)
+        for index, token in enumerate(tokens):
+            await asyncio.sleep(self._delay(index))
+            if index == failing:
+                raise ProviderError(f'Fallo simulado tras {index} tokens')
+            yield token
+        if failing == len(tokens):
+            raise ProviderError(f'Fallo simulado tras {len(tokens)} tokens')
+
+    def complete(self, messages, max_tokens, temperature):
+        tokens, failing = self._plan(max_tokens)
+        if failing is not None:
+            time.sleep(sum(self._delay(index) for index in range(failing)))
+            raise ProviderError(f'Fallo simulado tras {failing} tokens')
+        time.sleep(sum(self._delay(index) for index in range(len(tokens))))
+        return ''.join(tokens).rstrip()
+
+
+def fake_from_env():
+    return FakeProvider(
+        tokens_per_second=float(os.getenv('CHAT_FAKE_TOKENS_PER_SECOND', '50')),
+        first_token_latency=float(os.getenv('CHAT_FAKE_FIRST_TOKEN_MS', '300')) / 1000,
+        error_rate=float(os.getenv('CHAT_FAKE_ERROR_RATE', '0')),
+        reply_tokens=int(os.getenv('CHAT_FAKE_REPLY_TOKENS', '80')),
+    )
@@ -0,0 +1,70 @@
+"""
+Output stage of the chat stream.
+
+The model produces a delta every few tokens. Sending each one as its own SSE
+frame costs a ``json.dumps`` and a socket write per token, so deltas are
+coalesced into frames of up to ``CHAT_STREAM_FLUSH_CHARS`` characters,
+flushing at least every ``CHAT_STREAM_FLUSH_MS`` milliseconds so text still
+appears as it is generated, even if the model pauses.
+"""
+import asyncio
+import json
+import time
+
+from django.conf import settings
+
+FLUSH_CHARS = getattr(settings, 'CHAT_STREAM_FLUSH_CHARS', 64)
+FLUSH_SECONDS = getattr(settings, 'CHAT_STREAM_FLUSH_MS', 30) / 1000
+
+
+async def coalesce(deltas, flush_chars=FLUSH_CHARS, flush_seconds=FLUSH_SECONDS):
+    """Regroup the text deltas of an async iterator into larger chunks"""
+    iterator = deltas.__aiter__()
+    buffer = []
+    size = 0
+    deadline = None
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            if not done:
+                # The model paused: send what we have instead of waiting for more
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+
+            try:
+                delta = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            if not delta:
+                continue
+            buffer.append(delta)
+            size += len(delta)
+            if deadline is None:
+                deadline = time.monotonic() + flush_seconds
+            if size >= flush_chars or time.monotonic() >= deadline:
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        # Client went away mid-stream: stop asking the model for more
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        aclose = getattr(iterator, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+def sse_event(payload):
+    return f"data: {json.dumps(payload)}\n\n"
@@ -0,0 +1,209 @@
+"""
+Per-request telemetry for AplyBot.
+
+``AplyflyChatAgent`` fills a ``RequestMetrics`` for every answer: time to
+first token, total time, estimated prompt/completion tokens and the outcome
+(model, cache, coalesced, fallback, error or cancelled). Finished metrics go to an
+in-process buffer; a single background thread writes them to
+``ChatRequestMetric`` with ``bulk_create`` as soon as
+``CHAT_TELEMETRY_BATCH_SIZE`` are pending, so a stream never waits on the
+database. A timer thread, started with the first metric, writes whatever is
+buffered every ``CHAT_TELEMETRY_FLUSH_INTERVAL`` seconds even if no request
+arrives, and the buffer is flushed at exit. A crash loses at most one
+interval of metrics per worker.
+
+``hourly_summary()`` aggregates the table into per-hour percentiles for the
+admin panel (``/administrador/chat/``).
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .chat_prompt import CHARS_PER_TOKEN, message_tokens
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'CHAT_TELEMETRY', True)
+BATCH_SIZE = getattr(settings, 'CHAT_TELEMETRY_BATCH_SIZE', 50)
+FLUSH_INTERVAL = getattr(settings, 'CHAT_TELEMETRY_FLUSH_INTERVAL', 10)
+
+_lock = threading.Lock()
+_buffer = []
+_last_flush = time.monotonic()
+# One writer thread: batches are written in order and never concurrently
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-telemetry')
+_timer = None
+
+
+class RequestMetrics:
+    """Measurements of one chat request, recorded by ``finish()``"""
+
+    def __init__(self, provider=None, streaming=True):
+        self.created_at = timezone.now()
+        self.provider = provider.name if provider else ''
+        self.streaming = streaming
+        self.outcome = 'cancelled'  # until the agent says otherwise
+        self.prompt_tokens = 0
+        self._started = time.monotonic()
+        self._first_token = None
+        self._completion_chars = 0
+
+    def set_prompt(self, messages):
+        self.prompt_tokens = sum(message_tokens(message) for message in messages)
+
+    def add_output(self, text):
+        if self._first_token is None:
+            self._first_token = time.monotonic()
+        self._completion_chars += len(text)
+
+    def finish(self):
+        now = time.monotonic()
+        record(
+            created_at=self.created_at,
+            outcome=self.outcome,
+            provider=self.provider,
+            streaming=self.streaming,
+            ttft_ms=round((self._first_token - self._started) * 1000) if self._first_token is not None else None,
+            total_ms=round((now - self._started) * 1000),
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=math.ceil(self._completion_chars / CHARS_PER_TOKEN),
+        )
+
+
+def record(**fields):
+    """Buffer one metric row; schedules a background write when a batch is due"""
+    global _last_flush, _timer
+
+    if not ENABLED:
+        return
+    with _lock:
+        _buffer.append(fields)
+        if _timer is None:
+            # Started here, not at import: after the server forks its workers
+            _timer = threading.Thread(target=_flush_periodically, name='chat-telemetry-timer', daemon=True)
+            _timer.start()
+        due = len(_buffer) >= BATCH_SIZE or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        if not due:
+            return
+        batch = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    _writer.submit(_write, batch)
+
+
+def _write(batch):
+    from .models import ChatRequestMetric
+
+    close_old_connections()
+    try:
+        ChatRequestMetric.objects.bulk_create([ChatRequestMetric(**fields) for fields in batch])
+    except Exception:
+        # Telemetry must never break the chat
+        logger.exception('No se pudieron guardar %d métricas del chat', len(batch))
+
+
+def flush(wait=False):
+    """Write whatever this worker has buffered"""
+    global _last_flush
+
+    with _lock:
+        batch = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if batch:
+        future = _writer.submit(_write, batch)
+        if wait:
+            future.result()
+
+
+def _flush_periodically():
+    while True:
+        with _lock:
+            remaining = _last_flush + FLUSH_INTERVAL - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+            continue
+        try:
+            flush()
+        except Exception:
+            logger.exception('No se pudieron volcar las métricas del chat')
+
+
+def _flush_at_exit():
+    try:
+        flush(wait=True)
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile ``p`` (0-100) of ``values``"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _stats(bucket):
+    requests = len(bucket['total'])
+    outcomes = bucket['outcomes']
+    stats = {
+        'requests': requests,
+        'cache_rate': outcomes.get('cache', 0) / requests,
+        'coalesced_rate': outcomes.get('coalesced', 0) / requests,
+        'fallback_rate': (outcomes.get('fallback', 0) + outcomes.get('error', 0)) / requests,
+        'cancelled': outcomes.get('cancelled', 0),
+        'prompt_tokens': bucket['prompt'],
+        'completion_tokens': bucket['completion'],
+        'avg_prompt_tokens': round(bucket['prompt'] / requests),
+        'avg_completion_tokens': round(bucket['completion'] / requests),
+    }
+    for p in (50, 95, 99):
+        stats[f'ttft_p{p}'] = percentile(bucket['ttft'], p)
+        stats[f'total_p{p}'] = percentile(bucket['total'], p)
+    return stats
+
+
+def _new_bucket():
+    return {'outcomes': {}, 'ttft': [], 'total': [], 'prompt': 0, 'completion': 0}
+
+
+def hourly_summary(hours=24):
+    """
+    ``(hours, overall)``: per-hour request counts, outcome rates, latency
+    percentiles and token totals (newest first) and the same over the whole
+    period (``None`` without requests)
+    """
+    from .models import ChatRequestMetric
+
+    now = timezone.localtime()
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    rows = ChatRequestMetric.objects.filter(created_at__gte=since).values_list(
+        'created_at', 'outcome', 'ttft_ms', 'total_ms', 'prompt_tokens', 'completion_tokens',
+    )
+
+    hourly = {}
+    overall = _new_bucket()
+    for created_at, outcome, ttft, total, prompt, completion in rows.iterator():
+        hour = timezone.localtime(created_at).replace(minute=0, second=0, microsecond=0)
+        for bucket in (hourly.setdefault(hour, _new_bucket()), overall):
+            bucket['outcomes'][outcome] = bucket['outcomes'].get(outcome, 0) + 1
+            if ttft is not None:
+                bucket['ttft'].append(ttft)
+            bucket['total'].append(total)
+            bucket['prompt'] += prompt
+            bucket['completion'] += completion
+
+    summary = [dict(_stats(bucket), hour=hour) for hour, bucket in sorted(hourly.items(), reverse=True)]
+    return summary, _stats(overall) if overall['total'] else None
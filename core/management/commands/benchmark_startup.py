@@ -0,0 +1,64 @@
+"""Comando de gestión para medir el tiempo de arranque de un worker"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Lo que importa un worker ASGI al arrancar: settings, apps, URLconf y vistas
+BOOT = (
+    'import django; django.setup(); '
+    'import mydevsite.asgi; '
+    'from django.urls import get_resolver; get_resolver().url_patterns; '
+    'import core.views'
+)
+# Comportamiento anterior: openai se importaba y el agente se construía al importar core.ai_agent
+EAGER = BOOT + '; import openai; from core.ai_agent import get_agent; get_agent()'
+
+# "import time: self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def _run(code):
+    """Ejecuta ``code`` con ``-X importtime``; devuelve ``{módulo: µs acumulados}`` de primer nivel"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'mydevsite.settings'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        # Con sangría de un solo espacio = importado directamente, no por otro módulo
+        if match and len(match.group(3)) == 1:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Mide con python -X importtime el arranque de un worker, con el agente de chat perezoso y construido al importar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Repeticiones por escenario (se informa la mediana)')
+        parser.add_argument('--top', type=int, default=8, help='Módulos más lentos a mostrar')
+
+    def handle(self, *args, **options):
+        results = {}
+        for label, code in (('perezoso', BOOT), ('al importar', EAGER)):
+            runs = [_run(code) for _ in range(max(1, options['runs']))]
+            total = statistics.median(sum(modules.values()) for modules in runs)
+            results[label] = (total, runs[-1])
+
+            self.stdout.write(f'\n📦 Agente {label}: {total / 1000:.1f} ms de imports')
+            self.stdout.write(f"   openai importado: {'sí' if 'openai' in runs[-1] else 'no'}")
+            slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[:options['top']]
+            for module, micros in slowest:
+                self.stdout.write(f'   {micros / 1000:8.1f} ms  {module}')
+
+        lazy, eager = results['perezoso'][0], results['al importar'][0]
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Arranque: {eager / 1000:.1f} ms → {lazy / 1000:.1f} ms ({(eager - lazy) / 1000:.1f} ms menos por worker)'
+        ))
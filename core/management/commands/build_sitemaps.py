@@ -0,0 +1,13 @@
+"""Comando de gestión para generar los archivos de sitemap"""
+from django.core.management.base import BaseCommand
+from core import sitemap_files
+
+
+class Command(BaseCommand):
+    help = 'Genera sitemap_index.xml y todos los sitemaps fragmentados en SITEMAP_ROOT'
+
+    def handle(self, *args, **options):
+        shards = sitemap_files.build_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Sitemaps generados en {sitemap_files.SITEMAP_ROOT} ({shards} fragmentos de artículos)'
+        ))
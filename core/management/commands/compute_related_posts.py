@@ -0,0 +1,27 @@
+"""Comando de gestión para recalcular los artículos relacionados del blog"""
+from django.core.management.base import BaseCommand
+from core import blog_cache
+from core.related_posts import compute_related
+
+
+class Command(BaseCommand):
+    help = 'Calcula los artículos relacionados (TF-IDF) y guarda los top-k vecinos de cada artículo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post',
+            type=int,
+            action='append',
+            dest='post_ids',
+            help='Recalcula solo este artículo (y los afectados). Se puede repetir',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔗 Calculando artículos relacionados...')
+        updated = compute_related(options['post_ids'])
+        # Cached pages embed the related posts: invalidate them only if a list changed
+        if updated:
+            blog_cache.bump_blog_version()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Vecinos actualizados para {updated} artículos')
+        )
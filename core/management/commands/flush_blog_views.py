@@ -0,0 +1,21 @@
+"""Comando de gestión para volcar las visitas del blog acumuladas en caché"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core import view_counter
+from core.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Escribe en la base de datos las visitas del blog pendientes en el contador'
+
+    def handle(self, *args, **options):
+        if 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Caché local (sin REDIS_URL): este proceso no ve las visitas de los workers web, '
+                'que las escriben ellos mismos periódicamente y al terminar'
+            ))
+        post_ids = BlogPost.objects.values_list('id', flat=True)
+        flushed = view_counter.flush(post_ids=list(post_ids))
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {flushed} visitas escritas en la base de datos')
+        )
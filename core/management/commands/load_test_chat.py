@@ -0,0 +1,184 @@
+"""Comando de gestión para medir el rendimiento del chat IA bajo carga"""
+import asyncio
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.conf import settings
+from core import chat_admission, chat_telemetry
+from core.ai_agent import ERROR_MESSAGE, FALLBACK_MESSAGE, get_agent
+from core.chat_prompt import estimate_tokens
+from core.chat_providers import FakeProvider
+from core.models import ChatConversation
+
+
+class Command(BaseCommand):
+    help = (
+        'Lanza N sesiones de chat streaming concurrentes contra /api/chat/ (en proceso, sin red) '
+        'y mide TTFB, tokens/s y latencias p50/p95/p99'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=20, help='Sesiones concurrentes (default: 20)')
+        parser.add_argument('--turns', type=int, default=3, help='Mensajes por sesión, en la misma conversación (default: 3)')
+        parser.add_argument('--message', default='¿Qué servicios de inteligencia artificial ofrecen?', help='Mensaje base')
+        parser.add_argument(
+            '--repeat-message',
+            action='store_true',
+            help='Envía siempre el mismo mensaje (mide la caché de respuestas); por defecto cada mensaje es único',
+        )
+        parser.add_argument(
+            '--provider',
+            choices=['fake', 'configured'],
+            default='fake',
+            help='fake: proveedor simulado sin red (default); configured: el proveedor configurado del agente',
+        )
+        parser.add_argument('--tokens-per-second', type=float, default=50, help='Proveedor simulado: tokens por segundo')
+        parser.add_argument('--first-token-ms', type=float, default=300, help='Proveedor simulado: latencia del primer token')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Proveedor simulado: probabilidad de fallo (0-1)')
+        parser.add_argument('--reply-tokens', type=int, default=80, help='Proveedor simulado: tokens por respuesta')
+        parser.add_argument(
+            '--max-in-flight',
+            type=int,
+            help='Sustituye CHAT_MAX_IN_FLIGHT durante la prueba (la cuota por IP siempre se desactiva)',
+        )
+        parser.add_argument('--keep', action='store_true', help='Conserva las conversaciones creadas por la prueba')
+        parser.add_argument(
+            '--telemetry',
+            action='store_true',
+            help='Registra las peticiones de la prueba en la telemetría del chat (por defecto no se guardan)',
+        )
+
+    def handle(self, *args, **options):
+        agent = get_agent()
+        controller = chat_admission.controller
+        saved = (agent.provider, controller.max_in_flight, chat_admission.quota.limit, chat_telemetry.ENABLED)
+        if options['provider'] == 'fake':
+            agent.provider = FakeProvider(
+                tokens_per_second=options['tokens_per_second'],
+                first_token_latency=options['first_token_ms'] / 1000,
+                error_rate=options['error_rate'],
+                reply_tokens=options['reply_tokens'],
+            )
+        elif agent.provider is None:
+            self.stdout.write(self.style.WARNING('⚠️ No hay proveedor configurado: se medirán las respuestas de fallback'))
+        if options['max_in_flight']:
+            controller.max_in_flight = options['max_in_flight']
+        # Todas las sesiones salen de la misma IP
+        chat_admission.quota.limit = 0
+        chat_telemetry.ENABLED = options['telemetry']
+
+        provider_name = agent.provider.name if agent.provider else 'fallback'
+        self.conversation_ids = set()
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results, wall = asyncio.run(self.run(options))
+            admission = controller.stats()
+            coalescing = agent.single_flight.stats()
+        finally:
+            agent.provider, controller.max_in_flight, chat_admission.quota.limit, chat_telemetry.ENABLED = saved
+            chat_telemetry.flush(wait=True)
+            if not options['keep']:
+                ChatConversation.objects.filter(pk__in=self.conversation_ids).delete()
+
+        self.report(results, wall, provider_name, admission, coalescing, options)
+
+    async def run(self, options):
+        client = AsyncClient()
+        started = time.monotonic()
+        sessions = await asyncio.gather(*[
+            self.session(client, index, options) for index in range(options['sessions'])
+        ])
+        return [result for session in sessions for result in session], time.monotonic() - started
+
+    async def session(self, client, index, options):
+        results = []
+        conversation_id = None
+        for turn in range(options['turns']):
+            message = options['message']
+            if not options['repeat_message']:
+                message = f'{message} ({index}-{turn}-{uuid.uuid4().hex[:6]})'
+            result = await self.request(client, message, conversation_id)
+            conversation_id = result.pop('conversation_id') or conversation_id
+            results.append(result)
+        return results
+
+    async def request(self, client, message, conversation_id):
+        started = time.monotonic()
+        response = await client.post(
+            '/api/chat/',
+            json.dumps({'message': message, 'conversation_id': conversation_id, 'streaming': True}),
+            content_type='application/json',
+        )
+        result = {'status': response.status_code, 'conversation_id': response.get('X-Conversation-Id')}
+        if result['conversation_id']:
+            self.conversation_ids.add(result['conversation_id'])
+        if response.status_code != 200:
+            return result
+
+        ttfb = None
+        parts = []
+        error = False
+        async for frame in response.streaming_content:
+            for line in frame.decode().splitlines():
+                if not line.startswith('data: '):
+                    continue
+                event = json.loads(line[6:])
+                if event['type'] == 'content':
+                    if ttfb is None:
+                        ttfb = time.monotonic() - started
+                    parts.append(event['chunk'])
+                elif event['type'] == 'error':
+                    error = True
+        total = time.monotonic() - started
+        answer = ''.join(parts)
+        tokens = estimate_tokens(answer)
+        result.update(
+            ttfb=ttfb if ttfb is not None else total,
+            total=total,
+            tokens=tokens,
+            # Ritmo de generación visto por el cliente: desde el primer byte hasta el final
+            tokens_per_second=tokens / (total - ttfb) if ttfb is not None and total > ttfb else 0.0,
+            failed=error or answer.endswith(ERROR_MESSAGE) or answer == FALLBACK_MESSAGE,
+        )
+        return result
+
+    def report(self, results, wall, provider_name, admission, coalescing, options):
+        ok = [r for r in results if r['status'] == 200]
+        streamed = [r for r in ok if not r['failed']]
+        statuses = {}
+        for r in results:
+            statuses[r['status']] = statuses.get(r['status'], 0) + 1
+
+        self.stdout.write(
+            f"\n🧪 {options['sessions']} sesiones × {options['turns']} mensajes, "
+            f'proveedor {provider_name}, '
+            f'{wall:.2f} s en total'
+        )
+        self.stdout.write(f'   Respuestas HTTP: {dict(sorted(statuses.items()))}')
+        self.stdout.write(f'   Fallos del modelo (respuesta de error/fallback): {len(ok) - len(streamed)}')
+        if not ok:
+            self.stdout.write(self.style.ERROR('❌ Ninguna petición completada'))
+            return
+
+        rows = (
+            ('TTFB (ms)', [r['ttfb'] * 1000 for r in ok]),
+            ('Latencia total (ms)', [r['total'] * 1000 for r in ok]),
+            ('Tokens/s por sesión', [r['tokens_per_second'] for r in streamed]),
+        )
+        self.stdout.write(f"\n   {'':22} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9}")
+        for label, values in rows:
+            self.stdout.write(
+                f'   {label:22} ' + ' '.join(f'{chat_telemetry.percentile(values, p) or 0:9.1f}' for p in (50, 95, 99))
+                + f' {max(values, default=0):9.1f}'
+            )
+
+        tokens = sum(r['tokens'] for r in ok)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {len(ok) / wall:.1f} peticiones/s, {tokens / wall:.0f} tokens/s agregados '
+            f'({tokens} tokens estimados)'
+        ))
+        self.stdout.write(f'   Admisión: {admission}')
+        self.stdout.write(f'   Generaciones compartidas: {coalescing}')
@@ -0,0 +1,62 @@
+"""Comando de gestión para publicar los artículos programados del blog"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core import blog_cache
+from core.related_posts import compute_related
+from core.models import BlogPost, BlogPostTag, Tag
+
+
+class Command(BaseCommand):
+    help = 'Hace visibles los artículos publicados cuya fecha de publicación ya llegó'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Se queda en ejecución revisando periódicamente (modo worker)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Segundos entre revisiones en modo --loop (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        if 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Caché local (sin REDIS_URL): la web no verá la invalidación de sus páginas cacheadas'
+            ))
+        while True:
+            published = self.publish_due_posts()
+            if published:
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ {published} artículos programados publicados')
+                )
+            elif not options['loop']:
+                self.stdout.write('📭 No hay artículos programados pendientes')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def publish_due_posts(self):
+        with transaction.atomic():
+            post_ids = list(BlogPost.objects.due_for_publishing().select_for_update().values_list('id', flat=True))
+            if not post_ids:
+                return 0
+            BlogPost.objects.filter(pk__in=post_ids).update(is_visible=True)
+            tag_ids = BlogPostTag.objects.filter(post_id__in=post_ids).values_list('tag_id', flat=True)
+            Tag.refresh_counts(list(tag_ids))
+        # The web instances rebuild their sitemap files from the database
+        # (sitemap_files.ensure_fresh); this container's disk is never served.
+        # New visible posts change listings, sidebars and feeds: the versions
+        # live in the cache shared with the web service (REDIS_URL)
+        # Newly visible posts get neighbours and enter the others' top-k
+        compute_related(post_ids)
+        if BlogPost.objects.filter(pk__in=post_ids, is_news=True).exists():
+            blog_cache.bump_news_version()
+        blog_cache.bump_blog_version()
+        return len(post_ids)
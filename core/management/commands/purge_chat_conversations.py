@@ -0,0 +1,33 @@
+"""Comando de gestión para borrar conversaciones y métricas antiguas del chat"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import ChatConversation, ChatRequestMetric
+
+
+class Command(BaseCommand):
+    help = 'Elimina las conversaciones del chat sin actividad desde hace más de N días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Días de retención de las transcripciones (default: 30)',
+        )
+        parser.add_argument(
+            '--metrics-days',
+            type=int,
+            default=90,
+            help='Días de retención de las métricas del chat (default: 90)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ChatConversation.objects.filter(updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'🧹 {deleted} conversaciones eliminadas'))
+        
+        cutoff = timezone.now() - timedelta(days=options['metrics_days'])
+        deleted, _ = ChatRequestMetric.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'🧹 {deleted} métricas del chat eliminadas'))
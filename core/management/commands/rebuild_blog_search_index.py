@@ -0,0 +1,14 @@
+"""Comando de gestión para reconstruir el índice de búsqueda del blog"""
+from django.core.management.base import BaseCommand
+from core.blog_search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda full-text de los artículos del blog'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔎 Reconstruyendo índice de búsqueda del blog...')
+        indexed = rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Índice reconstruido: {indexed} artículos indexados')
+        )
@@ -0,0 +1,99 @@
+"""
+Project middleware.
+
+Both classes support sync and async requests. Under ASGI a single sync-only
+middleware makes Django run every request's view through one shared thread,
+so the chat API could not wait for an admission slot without stalling the
+rest of the site (see ``core.chat_admission``).
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import sitemap_files
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """``WhiteNoiseMiddleware`` that also runs in async mode"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # Same lookup as WhiteNoise: an in-memory dict unless autorefresh is on
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class SitemapFilesMiddleware:
+    """
+    Serve the pre-built sitemap files (``core.sitemap_files``) at the site root.
+
+    Uses WhiteNoise in autorefresh mode for this directory only: the files are
+    rewritten in place, so Last-Modified, ETag and Content-Length have to come
+    from a fresh ``stat`` instead of the snapshot WhiteNoise takes at startup.
+    Requests for files that have not been built fall through to Django.
+
+    Before serving, ``sitemap_files.ensure_fresh()`` brings the files in line
+    with the database (at most once every ``SITEMAP_CHECK_INTERVAL`` seconds),
+    so changes made by other processes, such as the publishing cron job, and a
+    redeploy that left the directory empty are picked up here.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.files = WhiteNoise(
+            None,
+            root=sitemap_files.SITEMAP_ROOT,
+            autorefresh=True,
+            max_age=sitemap_files.MAX_AGE,
+        )
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _is_sitemap(request):
+        path = request.path_info
+        return path.startswith('/sitemap') and path.endswith('.xml')
+
+    def _serve(self, request):
+        static_file = self.files.find_file(request.path_info)
+        if static_file is not None:
+            return WhiteNoiseMiddleware.serve(static_file, request)
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self._is_sitemap(request):
+            sitemap_files.ensure_fresh()
+            response = self._serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self._is_sitemap(request):
+            await sync_to_async(sitemap_files.ensure_fresh)()
+            response = self._serve(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
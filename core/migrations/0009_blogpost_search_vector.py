@@ -0,0 +1,67 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:18
+
+import django.contrib.postgres.search
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index on PostgreSQL, FTS5 table on SQLite; then index existing posts"""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX core_blogpost_search_gin "
+            "ON core_blogpost USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE core_blogpost SET search_vector = "
+            "setweight(to_tsvector('spanish', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('spanish', coalesce(excerpt, '')), 'B') || "
+            "setweight(to_tsvector('spanish', coalesce(tags, '')), 'B') || "
+            "setweight(to_tsvector('spanish', coalesce(content, '')), 'D')"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS core_blogpost_fts USING fts5("
+            "title, excerpt, tags, content, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        BlogPost = apps.get_model("core", "BlogPost")
+        rows = [
+            (post_id, title, excerpt, tags, strip_tags(content))
+            for post_id, title, excerpt, tags, content in BlogPost.objects.values_list(
+                "id", "title", "excerpt", "tags", "content"
+            )
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO core_blogpost_fts (rowid, title, excerpt, tags, content) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS core_blogpost_search_gin")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS core_blogpost_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_blogpost_is_news_blogpost_news_keywords_extra_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
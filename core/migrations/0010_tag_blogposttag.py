@@ -0,0 +1,91 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_blogpost_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("slug", models.SlugField(max_length=100, unique=True)),
+                (
+                    "post_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Artículos publicados con este tag"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="BlogPostTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tag_links",
+                        to="core.blogpost",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="post_links",
+                        to="core.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="tag_set",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="posts",
+                through="core.BlogPostTag",
+                to="core.tag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blogposttag",
+            index=models.Index(
+                fields=["tag", "post"], name="core_blogpo_tag_id_11e34d_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="blogposttag",
+            constraint=models.UniqueConstraint(
+                fields=("post", "tag"), name="unique_blogpost_tag"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def populate_tags(apps, schema_editor):
+    """Build the Tag index from the comma-separated BlogPost.tags field"""
+    BlogPost = apps.get_model("core", "BlogPost")
+    Tag = apps.get_model("core", "Tag")
+    BlogPostTag = apps.get_model("core", "BlogPostTag")
+
+    tags = {}
+    links = []
+    counts = {}
+    for post_id, status, csv in BlogPost.objects.values_list("id", "status", "tags"):
+        slugs = set()
+        for name in (tag.strip() for tag in csv.split(",")):
+            slug = slugify(name)
+            if not slug or slug in slugs:
+                continue
+            slugs.add(slug)
+            tags.setdefault(slug, name[:100])
+            links.append((post_id, slug))
+            if status == "published":
+                counts[slug] = counts.get(slug, 0) + 1
+
+    Tag.objects.bulk_create(
+        [
+            Tag(name=name, slug=slug, post_count=counts.get(slug, 0))
+            for slug, name in tags.items()
+        ],
+        ignore_conflicts=True,
+    )
+    tag_ids = dict(Tag.objects.values_list("slug", "id"))
+    BlogPostTag.objects.bulk_create(
+        [BlogPostTag(post_id=post_id, tag_id=tag_ids[slug]) for post_id, slug in links],
+        ignore_conflicts=True,
+    )
+
+
+def clear_tags(apps, schema_editor):
+    apps.get_model("core", "BlogPostTag").objects.all().delete()
+    apps.get_model("core", "Tag").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_tag_blogposttag"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, clear_tags),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_populate_tags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedPostScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbours",
+                        to="core.blogpost",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbour_of",
+                        to="core.blogpost",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["post", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["post", "rank"], name="core_relate_post_id_3b6d17_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="relatedpostscore",
+            constraint=models.UniqueConstraint(
+                fields=("post", "related"), name="unique_related_post_score"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_relatedpostscore"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blogpost",
+            index=models.Index(
+                fields=["status", "-published_at", "-id"], name="blogpost_keyset_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+from core.blog_render import render_article
+
+
+def render_existing_posts(apps, schema_editor):
+    BlogPost = apps.get_model("core", "BlogPost")
+    for post in BlogPost.objects.only("id", "content").iterator():
+        rendered = render_article(post.content)
+        BlogPost.objects.filter(pk=post.pk).update(
+            content_html=rendered.html,
+            toc=rendered.toc,
+            word_count=rendered.word_count,
+            reading_time=rendered.reading_time,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_blogpost_keyset_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="content_html",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="HTML procesado al guardar (lazy-loading, anclas)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="toc",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                editable=False,
+                help_text="Tabla de contenidos generada al guardar",
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def populate_is_visible(apps, schema_editor):
+    BlogPost = apps.get_model('core', 'BlogPost')
+    BlogPostTag = apps.get_model('core', 'BlogPostTag')
+    Tag = apps.get_model('core', 'Tag')
+
+    BlogPost.objects.filter(status='published', published_at__lte=timezone.now()).update(is_visible=True)
+    counts = BlogPostTag.objects.filter(
+        tag=OuterRef('pk'), post__is_visible=True
+    ).order_by().values('tag').annotate(total=Count('id')).values('total')
+    Tag.objects.update(post_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_blogpost_rendered_content"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="blogpost",
+            name="blogpost_keyset_idx",
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="is_visible",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Publicado y con fecha de publicación alcanzada",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blogpost",
+            index=models.Index(
+                fields=["is_visible", "-published_at", "-id"],
+                name="blogpost_visible_keyset_idx",
+            ),
+        ),
+        migrations.RunPython(populate_is_visible, migrations.RunPython.noop),
+    ]
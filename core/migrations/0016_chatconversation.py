@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:36
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_blogpost_is_visible"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatConversation",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("turns", models.JSONField(default=list)),
+                ("message_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                "verbose_name": "Conversación del chat",
+                "verbose_name_plural": "Conversaciones del chat",
+                "ordering": ["-updated_at"],
+            },
+        ),
+    ]
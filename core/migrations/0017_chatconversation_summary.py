@@ -0,0 +1,25 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_chatconversation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatconversation",
+            name="summarized_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Mensajes de turns ya incluidos en el resumen"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatconversation",
+            name="summary",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_chatconversation_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatRequestMetric",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(db_index=True)),
+                (
+                    "outcome",
+                    models.CharField(
+                        choices=[
+                            ("model", "Modelo"),
+                            ("cache", "Caché"),
+                            ("fallback", "Fallback (sin proveedor)"),
+                            ("error", "Error del modelo"),
+                            ("cancelled", "Cancelada por el cliente"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("provider", models.CharField(blank=True, max_length=20)),
+                ("streaming", models.BooleanField(default=True)),
+                ("ttft_ms", models.PositiveIntegerField(null=True)),
+                ("total_ms", models.PositiveIntegerField()),
+                ("prompt_tokens", models.PositiveIntegerField(default=0)),
+                ("completion_tokens", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Métrica del chat",
+                "verbose_name_plural": "Métricas del chat",
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_chatrequestmetric"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatrequestmetric",
+            name="outcome",
+            field=models.CharField(
+                choices=[
+                    ("model", "Modelo"),
+                    ("cache", "Caché"),
+                    ("coalesced", "Compartida con una petición idéntica"),
+                    ("fallback", "Fallback (sin proveedor)"),
+                    ("error", "Error del modelo"),
+                    ("cancelled", "Cancelada por el cliente"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
@@ -1,10 +1,20 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.conf import settings
+from . import blog_cache, blog_render, blog_search, chat_prompt, related_posts, sitemap_files, view_counter
 
 User = get_user_model()
 
+RELATED_POSTS_ON_SAVE = getattr(settings, 'BLOG_RELATED_ON_SAVE', False)
+
 class Service(models.Model):
     title = models.CharField(max_length=200)
     icon = models.CharField(max_length=50, help_text="Nombre del ícono de Font Awesome")
@@ -75,11 +85,63 @@ class BlogCategory(models.Model):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        sitemap_files.refresh_pages()
+        blog_cache.bump_blog_version()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        sitemap_files.refresh_pages()
+        blog_cache.bump_blog_version()
+        return result
     
     def __str__(self):
         return self.name
 
 
+class Tag(models.Model):
+    """Normalized blog tag with a precomputed count of visible posts"""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+    post_count = models.PositiveIntegerField(default=0, help_text="Artículos publicados con este tag")
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def refresh_counts(cls, tag_ids):
+        """Recompute post_count for the given tags in a single UPDATE"""
+        published = BlogPostTag.objects.filter(
+            tag=models.OuterRef('pk'),
+            post__is_visible=True
+        ).values('tag').annotate(total=models.Count('post')).values('total')
+        cls.objects.filter(pk__in=tag_ids).update(
+            post_count=Coalesce(models.Subquery(published), 0)
+        )
+
+
+class BlogPostQuerySet(models.QuerySet):
+    # Columns used by cards, sidebars, related posts and sitemaps
+    LISTING_FIELDS = (
+        'title', 'slug', 'category', 'excerpt', 'featured_image', 'featured_image_alt',
+        'status', 'published_at', 'updated_at', 'reading_time', 'views_count', 'is_news',
+    )
+    
+    def listing(self):
+        """Listing projection: skips the article body and the SEO/OG/search columns"""
+        return self.only(*self.LISTING_FIELDS)
+    
+    def visible(self):
+        """Posts the public can see (flag maintained by save() and publish_scheduled_posts)"""
+        return self.filter(is_visible=True)
+    
+    def due_for_publishing(self):
+        """Published posts whose publication date has passed but are not visible yet"""
+        return self.filter(status='published', is_visible=False, published_at__lte=timezone.now())
+
+
 class BlogPost(models.Model):
     """Blog posts with advanced SEO"""
     
@@ -98,6 +160,8 @@ class BlogPost(models.Model):
     # Content
     excerpt = models.TextField(max_length=300, help_text="Resumen corto (SEO: 150-160 caracteres)")
     content = models.TextField(help_text="Contenido completo del artículo (formato HTML)")
+    content_html = models.TextField(blank=True, editable=False, help_text="HTML procesado al guardar (lazy-loading, anclas)")
+    toc = models.JSONField(default=list, blank=True, editable=False, help_text="Tabla de contenidos generada al guardar")
     featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
     featured_image_alt = models.CharField(max_length=200, blank=True, help_text="Texto alternativo para SEO")
     
@@ -118,6 +182,7 @@ class BlogPost(models.Model):
     # Publishing
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     published_at = models.DateTimeField(null=True, blank=True)
+    is_visible = models.BooleanField(default=False, editable=False, help_text="Publicado y con fecha de publicación alcanzada")
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -129,11 +194,21 @@ class BlogPost(models.Model):
     # Analytics
     views_count = models.IntegerField(default=0)
     reading_time = models.IntegerField(default=5, help_text="Tiempo de lectura en minutos")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
     
     # Related Content
     tags = models.CharField(max_length=255, blank=True, help_text="Tags separados por comas")
+    tag_set = models.ManyToManyField(Tag, through='BlogPostTag', related_name='posts', blank=True)
     related_posts = models.ManyToManyField('self', blank=True, symmetrical=False)
     
+    # Search (PostgreSQL tsvector, GIN index created in migration 0009)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    objects = BlogPostQuerySet.as_manager()
+    
+    # Filled by the render stage in save()
+    RENDERED_FIELDS = {'content_html', 'toc', 'word_count', 'reading_time'}
+    
     class Meta:
         ordering = ['-published_at', '-created_at']
         verbose_name = "Blog Post"
@@ -142,8 +217,17 @@ class BlogPost(models.Model):
             models.Index(fields=['-published_at']),
             models.Index(fields=['slug']),
             models.Index(fields=['status']),
+            # Keyset pagination (core.blog_pagination)
+            models.Index(fields=['is_visible', '-published_at', '-id'], name='blogpost_visible_keyset_idx'),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored flag so un-marking a news post refreshes the news sitemap
+        instance._loaded_is_news = instance.__dict__.get('is_news', False)
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -158,12 +242,81 @@ class BlogPost(models.Model):
         if not self.og_description:
             self.og_description = self.excerpt[:200]
         
-        # Calculate reading time
-        if self.content:
-            words = len(self.content.split())
-            self.reading_time = max(1, words // 200)
+        # Public visibility (scheduled posts are flipped by publish_scheduled_posts)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'status', 'published_at'} & set(update_fields):
+            self.is_visible = self.status == 'published' and self.published_at is not None and self.published_at <= timezone.now()
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = set(update_fields) | {'is_visible'}
+        
+        # Render stage: processed HTML, table of contents, word count and reading time
+        if update_fields is None or 'content' in update_fields:
+            rendered = blog_render.render_article(self.content)
+            self.content_html = rendered.html
+            self.toc = rendered.toc
+            self.word_count = rendered.word_count
+            self.reading_time = rendered.reading_time
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = set(update_fields) | self.RENDERED_FIELDS
         
         super().save(*args, **kwargs)
+        
+        # Keep the search index in sync (skip saves that don't touch indexed text)
+        if update_fields is None or set(update_fields) & set(blog_search.INDEXED_FIELDS):
+            blog_search.update_search_index(self)
+        
+        if update_fields is None or {'tags', 'is_visible'} & set(update_fields):
+            self.sync_tags()
+        
+        if RELATED_POSTS_ON_SAVE and (
+            update_fields is None or set(update_fields) & set(blog_search.INDEXED_FIELDS + ('status',))
+        ):
+            # Rebuilds TF-IDF over the whole corpus: after commit, never inside the save
+            post_ids = [self.pk]
+            transaction.on_commit(lambda: related_posts.compute_related(post_ids))
+        
+        if update_fields is None or {'slug', 'updated_at', 'is_visible'} & set(update_fields):
+            sitemap_files.refresh_posts([self.pk])
+        
+        if self.is_news or getattr(self, '_loaded_is_news', False):
+            blog_cache.bump_news_version()
+        self._loaded_is_news = self.is_news
+        blog_cache.bump_blog_version()
+    
+    def delete(self, *args, **kwargs):
+        post_id = self.pk
+        tag_ids = list(self.tag_set.values_list('id', flat=True))
+        result = super().delete(*args, **kwargs)
+        Tag.refresh_counts(tag_ids)
+        blog_search.remove_from_search_index(post_id)
+        sitemap_files.refresh_posts([post_id])
+        if self.is_news:
+            blog_cache.bump_news_version()
+        blog_cache.bump_blog_version()
+        return result
+    
+    def sync_tags(self):
+        """Mirror the comma-separated tags field into the Tag index"""
+        tags = {}
+        for name in self.get_tags_list():
+            tags.setdefault(slugify(name), name)
+        tags.pop('', None)
+        
+        existing = {tag.slug: tag for tag in Tag.objects.filter(slug__in=tags)}
+        for slug, name in tags.items():
+            if slug not in existing:
+                existing[slug], _ = Tag.objects.get_or_create(slug=slug, defaults={'name': name[:100]})
+        
+        old_ids = set(self.tag_set.values_list('id', flat=True))
+        new_ids = {tag.id for tag in existing.values()}
+        if old_ids - new_ids:
+            BlogPostTag.objects.filter(post=self, tag_id__in=old_ids - new_ids).delete()
+        if new_ids - old_ids:
+            BlogPostTag.objects.bulk_create(
+                [BlogPostTag(post=self, tag_id=tag_id) for tag_id in new_ids - old_ids],
+                ignore_conflicts=True
+            )
+        Tag.refresh_counts(old_ids | new_ids)
     
     def __str__(self):
         return self.title
@@ -172,10 +325,137 @@ class BlogPost(models.Model):
         return reverse('blog:post_detail', kwargs={'slug': self.slug})
     
     def increment_views(self):
-        """Increment view count"""
+        """Increment view count (buffered, written in batches by core.view_counter)"""
+        view_counter.record_view(self.pk)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
     
     def get_tags_list(self):
         """Return tags as list"""
         return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
+
+
+class RelatedPostScore(models.Model):
+    """Precomputed top-k neighbours of a post (see core.related_posts)"""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='neighbours')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post_score'),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'rank']),
+        ]
+
+
+class BlogPostTag(models.Model):
+    """Indexed link between posts and tags"""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_links')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='unique_blogpost_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'post']),
+        ]
+
+
+class ChatConversation(models.Model):
+    """AplyBot conversation kept on the server: the widget only sends the new message"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Compact transcript: one [role, content] pair per message
+    turns = models.JSONField(default=list)
+    message_count = models.PositiveIntegerField(default=0)
+    # Running summary of the turns that left the prompt window (core.chat_prompt)
+    summary = models.TextField(blank=True)
+    summarized_count = models.PositiveIntegerField(default=0, help_text="Mensajes de turns ya incluidos en el resumen")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    # Idle time after which a conversation id is no longer continued
+    IDLE_TIMEOUT = getattr(settings, 'CHAT_CONVERSATION_IDLE_TIMEOUT', 60 * 60 * 2)
+    # Messages of context sent to the model (the server owns truncation)
+    HISTORY_MESSAGES = getattr(settings, 'CHAT_HISTORY_MESSAGES', 10)
+    MAX_MESSAGES = 200
+    MAX_MESSAGE_LENGTH = 4000
+    
+    class Meta:
+        ordering = ['-updated_at']
+        verbose_name = "Conversación del chat"
+        verbose_name_plural = "Conversaciones del chat"
+    
+    def __str__(self):
+        return f"{self.id} ({self.message_count} mensajes)"
+    
+    @classmethod
+    async def aresume(cls, conversation_id):
+        """The conversation to continue, or a new unsaved one if the id is unknown or expired"""
+        try:
+            conversation_id = uuid.UUID(str(conversation_id)) if conversation_id else None
+        except ValueError:
+            conversation_id = None
+        if conversation_id:
+            conversation = await cls.objects.filter(pk=conversation_id).afirst()
+            if conversation is not None and not conversation.is_expired():
+                return conversation
+        return cls()
+    
+    def is_expired(self):
+        return self.updated_at < timezone.now() - timedelta(seconds=self.IDLE_TIMEOUT)
+    
+    def prompt_history(self):
+        """
+        ``(summary, recent messages)`` for the model. Messages that no longer fit
+        the history token budget are folded into the running summary once.
+        """
+        pending = [{'role': role, 'content': content} for role, content in self.turns[self.summarized_count:]]
+        keep = min(self.HISTORY_MESSAGES, chat_prompt.newest_fitting(pending, chat_prompt.history_token_budget()))
+        folded = pending[:len(pending) - keep]
+        if folded:
+            self.summary = chat_prompt.fold_into_summary(self.summary, folded)
+            self.summarized_count += len(folded)
+        return self.summary, pending[len(pending) - keep:]
+    
+    def add_message(self, role, content):
+        self.turns.append([role, content[:self.MAX_MESSAGE_LENGTH]])
+        dropped = len(self.turns) - self.MAX_MESSAGES
+        if dropped > 0:
+            # Only already-summarized messages fall off the transcript
+            self.turns = self.turns[dropped:]
+            self.summarized_count = max(0, self.summarized_count - dropped)
+        self.message_count += 1
+
+
+class ChatRequestMetric(models.Model):
+    """One AplyBot request: latency and token accounting (written in batches by core.chat_telemetry)"""
+    OUTCOME_CHOICES = [
+        ('model', 'Modelo'),
+        ('cache', 'Caché'),
+        ('coalesced', 'Compartida con una petición idéntica'),
+        ('fallback', 'Fallback (sin proveedor)'),
+        ('error', 'Error del modelo'),
+        ('cancelled', 'Cancelada por el cliente'),
+    ]
+    
+    created_at = models.DateTimeField(db_index=True)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    provider = models.CharField(max_length=20, blank=True)
+    streaming = models.BooleanField(default=True)
+    # Milliseconds; time to first token is null when nothing was generated
+    ttft_ms = models.PositiveIntegerField(null=True)
+    total_ms = models.PositiveIntegerField()
+    # Estimated tokens (core.chat_prompt.estimate_tokens)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Métrica del chat"
+        verbose_name_plural = "Métricas del chat"
+    
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M:%S} {self.outcome} {self.total_ms} ms"
@@ -1,78 +1,164 @@
-from django.http import HttpResponse
-from django.utils import timezone
+import hashlib
+import re
 from datetime import timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Min
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date
+from core import blog_cache
 from core.models import BlogPost
 
+SITE_URL = 'https://aplyfly.com'
+NEWS_WINDOW = timedelta(days=2)  # Google News solo indexa contenido de últimos 2 días
+NEWS_LIMIT = 1000  # Límite de Google News
+# The cached body is keyed on the news version, only safe with a shared cache
+NEWS_SITEMAP_CACHE = getattr(settings, 'BLOG_NEWS_SITEMAP_CACHE', True) and blog_cache.SHARED
+NEWS_SITEMAP_TIMEOUT = getattr(settings, 'BLOG_NEWS_SITEMAP_TIMEOUT', 60 * 60)
+NEWS_SITEMAP_MAX_AGE = getattr(settings, 'BLOG_NEWS_SITEMAP_MAX_AGE', 60 * 5)
 
-def google_news_sitemap(request):
+# Characters that are not allowed anywhere in an XML 1.0 document
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"\n'
+    '        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"\n'
+    '        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+_FOOTER = '</urlset>\n'
+
+
+def _xml_text(value):
+    return escape(_INVALID_XML_CHARS.sub('', value))
+
+
+def _news_keywords(post):
+    keywords = [k.strip() for k in f'{post.meta_keywords},{post.news_keywords_extra}'.split(',')]
+    # Google News admite hasta 10 keywords
+    return ', '.join([k for k in keywords if k][:10])
+
+
+def _news_window():
+    return BlogPost.objects.visible().filter(
+        is_news=True,
+        published_at__gte=timezone.now() - NEWS_WINDOW
+    )
+
+
+def _news_posts():
+    return _news_window().only(
+        'title', 'slug', 'published_at', 'updated_at', 'meta_keywords',
+        'news_keywords_extra', 'featured_image', 'featured_image_alt'
+    ).order_by('-published_at')[:NEWS_LIMIT]
+
+
+def news_sitemap_chunks(posts):
     """
-    Genera un sitemap específico para Google News con formato XML correcto
+    Genera el sitemap de Google News por fragmentos, un <url> por artículo.
     Google News requiere: publication name, publication date, title
-    Solo indexa contenido de últimos 2 días
     """
-    # Obtener artículos de noticias de últimos 2 días
-    two_days_ago = timezone.now() - timedelta(days=2)
-    news_posts = BlogPost.objects.filter(
-        status='published',
-        is_news=True,
-        published_at__gte=two_days_ago
-    ).order_by('-published_at')[:1000]  # Límite de Google News
-    
-    # Construir XML
-    xml = ['<?xml version="1.0" encoding="UTF-8"?>']
-    xml.append('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"')
-    xml.append('        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"')
-    xml.append('        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">')
-    
-    for post in news_posts:
-        xml.append('  <url>')
-        xml.append(f'    <loc>https://aplyfly.com{post.get_absolute_url()}</loc>')
-        
-        # Google News específico
-        xml.append('    <news:news>')
-        xml.append('      <news:publication>')
-        xml.append('        <news:name>Aplyfly Tech News</news:name>')
-        xml.append('        <news:language>es</news:language>')
-        xml.append('      </news:publication>')
-        
-        # Fecha de publicación (formato W3C)
-        pub_date = post.published_at.strftime('%Y-%m-%dT%H:%M:%S%z')
-        xml.append(f'      <news:publication_date>{pub_date}</news:publication_date>')
-        
-        # Título (escapar caracteres especiales)
-        title = post.title.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        xml.append(f'      <news:title>{title}</news:title>')
-        
-        # Keywords para Google News
-        if post.meta_keywords or post.news_keywords_extra:
-            keywords = post.meta_keywords or ""
-            if post.news_keywords_extra:
-                keywords = keywords + ", " + post.news_keywords_extra if keywords else post.news_keywords_extra
-            # Limpiar y limitar a 10 keywords
-            keywords_list = [k.strip() for k in keywords.split(',')][:10]
-            keywords_clean = ', '.join(keywords_list)
-            xml.append(f'      <news:keywords>{keywords_clean}</news:keywords>')
-        
-        xml.append('    </news:news>')
-        
+    # Prefijos calculados una sola vez en vez de reverse()/storage.url() por artículo
+    post_url = SITE_URL + reverse('blog:post_detail', kwargs={'slug': 'SLUG'}).replace('SLUG', '{}')
+    media_url = default_storage.url('')
+    if media_url.startswith('/'):
+        media_url = SITE_URL + media_url
+
+    yield _HEADER
+    for post in posts:
+        title = _xml_text(post.title)
+        parts = [
+            '  <url>\n',
+            f'    <loc>{_xml_text(post_url.format(post.slug))}</loc>\n',
+            '    <news:news>\n',
+            '      <news:publication>\n',
+            '        <news:name>Aplyfly Tech News</news:name>\n',
+            '        <news:language>es</news:language>\n',
+            '      </news:publication>\n',
+            # Fecha de publicación (formato W3C)
+            f'      <news:publication_date>{post.published_at.isoformat(timespec="seconds")}</news:publication_date>\n',
+            f'      <news:title>{title}</news:title>\n',
+        ]
+        keywords = _news_keywords(post)
+        if keywords:
+            parts.append(f'      <news:keywords>{_xml_text(keywords)}</news:keywords>\n')
+        parts.append('    </news:news>\n')
+
         # Imagen destacada (opcional pero recomendado)
         if post.featured_image:
-            xml.append('    <image:image>')
-            xml.append(f'      <image:loc>https://aplyfly.com{post.featured_image.url}</image:loc>')
+            parts.append('    <image:image>\n')
+            parts.append(f'      <image:loc>{_xml_text(media_url + filepath_to_uri(post.featured_image.name))}</image:loc>\n')
             if post.featured_image_alt:
-                caption = post.featured_image_alt.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                xml.append(f'      <image:caption>{caption}</image:caption>')
-            xml.append(f'      <image:title>{title}</image:title>')
-            xml.append('    </image:image>')
-        
-        # Last modified
-        lastmod = post.updated_at.strftime('%Y-%m-%dT%H:%M:%S%z')
-        xml.append(f'    <lastmod>{lastmod}</lastmod>')
-        xml.append(f'    <changefreq>hourly</changefreq>')
-        xml.append(f'    <priority>1.0</priority>')
-        
-        xml.append('  </url>')
-    
-    xml.append('</urlset>')
-    
-    return HttpResponse('\n'.join(xml), content_type='application/xml; charset=utf-8')
+                parts.append(f'      <image:caption>{_xml_text(post.featured_image_alt)}</image:caption>\n')
+            parts.append(f'      <image:title>{title}</image:title>\n')
+            parts.append('    </image:image>\n')
+
+        parts += [
+            f'    <lastmod>{post.updated_at.isoformat(timespec="seconds")}</lastmod>\n',
+            '    <changefreq>hourly</changefreq>\n',
+            '    <priority>1.0</priority>\n',
+            '  </url>\n',
+        ]
+        yield ''.join(parts)
+    yield _FOOTER
+
+
+def _cached_news_sitemap():
+    """``(body, etag, last_modified)`` cacheado hasta que cambie un artículo de noticias"""
+    key = f'blog:news-sitemap:{blog_cache.news_version()}'
+    entry = cache.get(key)
+    if entry is None:
+        posts = list(_news_posts())
+        body = ''.join(news_sitemap_chunks(posts))
+        entry = (body, f'"{hashlib.md5(body.encode()).hexdigest()}"', timezone.now())
+        timeout = NEWS_SITEMAP_TIMEOUT
+        if posts:
+            # The oldest post leaves the 2-day window even if nothing is saved
+            expires_in = (posts[-1].published_at + NEWS_WINDOW - timezone.now()).total_seconds()
+            timeout = max(1, min(timeout, int(expires_in) + 1))
+        cache.set(key, entry, timeout)
+    return entry
+
+
+def _news_validators():
+    """ETag y Last-Modified sin generar el cuerpo: una consulta de agregación indexada"""
+    stats = _news_window().aggregate(total=Count('id'), latest=Max('updated_at'), oldest=Min('id'))
+    latest = stats['latest'] or blog_cache.version_datetime(blog_cache.news_version())
+    digest = hashlib.md5(f'{stats["total"]}:{stats["oldest"]}:{latest.isoformat()}'.encode()).hexdigest()
+    return f'"{digest}"', latest
+
+
+def google_news_sitemap(request):
+    """
+    Sitemap específico para Google News - Solo artículos de últimos 2 días.
+    Con BLOG_NEWS_SITEMAP_CACHE se sirve un cuerpo cacheado; si no, se
+    transmite en streaming directamente desde la base de datos.
+    """
+    content_type = 'application/xml; charset=utf-8'
+    if NEWS_SITEMAP_CACHE:
+        body, etag, last_modified = _cached_news_sitemap()
+    else:
+        body = None
+        etag, last_modified = _news_validators()
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if not_modified is not None:
+        response = not_modified
+    elif body is not None:
+        response = HttpResponse(body, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            news_sitemap_chunks(_news_posts().iterator(chunk_size=200)),
+            content_type=content_type,
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, public=True, max_age=NEWS_SITEMAP_MAX_AGE)
+    return response
@@ -0,0 +1,189 @@
+"""
+Offline related-posts engine.
+
+Builds TF-IDF vectors over title, tags, excerpt and content of every visible
+post and stores the top-k most similar posts per post in ``RelatedPostScore``.
+Manually curated ``related_posts`` always come first. Run it in full with
+``manage.py compute_related_posts`` (an hourly cron job in ``render.yaml``)
+or for a single post, which also refreshes the posts whose top-k the change
+affects. Either way it reads the whole corpus, so ``BlogPost.save`` only
+triggers it, after commit, with ``BLOG_RELATED_ON_SAVE``.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils.html import strip_tags
+
+TOP_K = getattr(settings, 'BLOG_RELATED_TOP_K', 6)
+
+# Term weight per field: a word in the title says more than one in the body
+FIELD_WEIGHTS = (('title', 3.0), ('tags', 3.0), ('excerpt', 2.0), ('content', 1.0))
+
+TOKEN_RE = re.compile(r'[a-z0-9]{3,}')
+
+STOPWORDS = frozenset("""
+    algo ante antes aqui asi aun bien cada como con contra cual cuando del desde
+    donde dos durante ella ellas ellos entre era eran esa esas ese eso esos esta
+    estan estas este esto estos fue fueron hay hace hacer las les los mas mismo
+    muy nos nuestra nuestro otra otras otro otros para pero poco por porque puede
+    pueden que quien sea segun ser sido sin sobre solo son sus tambien tan tanto
+    tiene tienen todo todos tras una uno unos usted vez the and for with you are
+""".split())
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def _terms(post):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        text = post[field] or ''
+        if field == 'content':
+            text = strip_tags(text)
+        for token in TOKEN_RE.findall(_normalize(text)):
+            if token not in STOPWORDS:
+                counts[token] += weight
+    return counts
+
+
+def build_vectors(posts):
+    """L2-normalized sparse TF-IDF vectors ``{post_id: {term: weight}}``"""
+    term_counts = {post['id']: _terms(post) for post in posts}
+    document_frequency = Counter()
+    for counts in term_counts.values():
+        document_frequency.update(counts.keys())
+
+    total = len(term_counts)
+    idf = {
+        term: math.log((1 + total) / (1 + frequency)) + 1
+        for term, frequency in document_frequency.items()
+    }
+    vectors = {}
+    for post_id, counts in term_counts.items():
+        vector = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors[post_id] = {term: weight / norm for term, weight in vector.items()}
+    return vectors
+
+
+def _postings(vectors):
+    index = defaultdict(list)
+    for post_id, vector in vectors.items():
+        for term, weight in vector.items():
+            index[term].append((post_id, weight))
+    return index
+
+
+def _similarities(post_id, vectors, postings):
+    """Cosine similarity of ``post_id`` against every post sharing a term"""
+    scores = defaultdict(float)
+    for term, weight in vectors[post_id].items():
+        for other_id, other_weight in postings[term]:
+            if other_id != post_id:
+                scores[other_id] += weight * other_weight
+    return scores
+
+
+def _corpus():
+    from .models import BlogPost
+
+    # Visible posts only: a scheduled post must not take a slot before it goes live
+    posts = list(BlogPost.objects.visible().values(
+        'id', 'title', 'tags', 'excerpt', 'content'
+    ))
+    manual = defaultdict(list)
+    for from_id, to_id in BlogPost.related_posts.through.objects.filter(
+        to_blogpost__is_visible=True
+    ).values_list('from_blogpost_id', 'to_blogpost_id').order_by('id'):
+        manual[from_id].append(to_id)
+    return posts, manual
+
+
+def _rows(post_id, scores, manual_ids):
+    from .models import RelatedPostScore
+
+    rows = [
+        RelatedPostScore(post_id=post_id, related_id=related_id, score=1.0, rank=rank)
+        for rank, related_id in enumerate(manual_ids[:TOP_K])
+    ]
+    best = heapq.nlargest(
+        TOP_K - len(rows),
+        ((score, related_id) for related_id, score in scores.items() if related_id not in manual_ids),
+    )
+    rows += [
+        RelatedPostScore(post_id=post_id, related_id=related_id, score=score, rank=len(rows) + offset)
+        for offset, (score, related_id) in enumerate(best)
+        if score > 0
+    ]
+    return rows
+
+
+def compute_related(post_ids=None):
+    """
+    Recompute stored neighbours.
+
+    With ``post_ids`` only those posts are recomputed, plus every other post
+    whose current top-k would change because of them. Only posts whose
+    ``(related post, rank)`` list differs from the stored one are rewritten;
+    returns how many.
+    """
+    from .models import RelatedPostScore
+
+    posts, manual = _corpus()
+    vectors = build_vectors(posts)
+    postings = _postings(vectors)
+
+    if post_ids is None:
+        targets = set(vectors)
+        stale = set()
+    else:
+        targets = {post_id for post_id in post_ids if post_id in vectors}
+        # Posts no longer visible must drop out of everyone's recommendations
+        stale = set(post_ids) - targets
+        affected = set(RelatedPostScore.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+        # A post is affected when a target would now enter its top-k
+        current = {
+            owner_id: (total, lowest) for owner_id, total, lowest in RelatedPostScore.objects.values(
+                'post_id'
+            ).annotate(total=Count('id'), lowest=Min('score')).values_list('post_id', 'total', 'lowest')
+        }
+        for post_id in targets:
+            for other_id, score in _similarities(post_id, vectors, postings).items():
+                total, lowest = current.get(other_id, (0, 0.0))
+                if total < TOP_K or score > lowest:
+                    affected.add(other_id)
+        targets |= affected & set(vectors)
+
+    computed = {
+        post_id: _rows(post_id, _similarities(post_id, vectors, postings), manual.get(post_id, []))
+        for post_id in targets
+    }
+
+    stored_rows = RelatedPostScore.objects.all()
+    if post_ids is not None:
+        stored_rows = stored_rows.filter(post_id__in=targets | stale)
+    stored = defaultdict(list)
+    for post_id, related_id, rank in stored_rows.order_by('post_id', 'rank').values_list('post_id', 'related_id', 'rank'):
+        stored[post_id].append((related_id, rank))
+
+    # Only posts whose list changed are rewritten, so an unchanged run writes nothing
+    changed = {
+        post_id for post_id, post_rows in computed.items()
+        if [(row.related_id, row.rank) for row in post_rows] != stored.get(post_id, [])
+    }
+    changed |= set(stored) - set(computed)
+    if changed:
+        with transaction.atomic():
+            RelatedPostScore.objects.filter(post_id__in=changed).delete()
+            RelatedPostScore.objects.bulk_create(
+                [row for post_id in changed for row in computed.get(post_id, [])]
+            )
+    return len(changed)
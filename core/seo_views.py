@@ -0,0 +1,60 @@
+"""
+robots.txt and the dynamic sitemap fallback, with HTTP validators so
+crawlers and CDNs can revalidate instead of re-downloading.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.sitemaps.views import sitemap as sitemap_view
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from . import blog_cache, sitemap_files
+
+ROBOTS_MAX_AGE = getattr(settings, 'ROBOTS_MAX_AGE', 60 * 60 * 24)
+
+_robots = None
+
+
+def _robots_txt():
+    """``(body, etag, last_modified)`` of robots.txt, rendered once per process"""
+    global _robots
+    if _robots is None:
+        template = get_template('robots.txt')
+        body = template.render().encode()
+        # The template's mtime is the same in every worker, unlike the render time
+        last_modified = int(os.path.getmtime(template.origin.name))
+        _robots = (body, f'"{hashlib.md5(body).hexdigest()}"', last_modified)
+    return _robots
+
+
+def robots_txt(request):
+    body, etag, last_modified = _robots_txt()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type='text/plain; charset=utf-8')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=ROBOTS_MAX_AGE)
+    return response
+
+
+def sitemap(request, sitemaps, **kwargs):
+    """Dynamic sitemap, only reached until ``build_sitemaps`` has written the static files"""
+    if not blog_cache.SHARED:
+        response = sitemap_view(request, sitemaps, **kwargs)
+        patch_cache_control(response, public=True, max_age=sitemap_files.MAX_AGE)
+        return response
+    # Every post/category change bumps the blog version, so it validates without a query
+    version = blog_cache.blog_version()
+    etag = f'"sitemap-{version}"'
+    last_modified = blog_cache.version_datetime(version)
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if response is None:
+        response = sitemap_view(request, sitemaps, **kwargs)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, public=True, max_age=sitemap_files.MAX_AGE)
+    return response
@@ -0,0 +1,235 @@
+"""
+Pre-built sitemap files.
+
+Crawlers are served static XML from ``SITEMAP_ROOT`` (see
+``core.middleware.SitemapFilesMiddleware``) and never reach the database:
+
+* ``sitemap_index.xml``, also written as ``sitemap.xml``, lists the shards
+* ``sitemap-pages.xml`` holds the static pages and blog categories
+* ``sitemap-posts-<n>.xml`` holds the visible posts with ids in
+  ``[n * SITEMAP_SHARD_SIZE, (n + 1) * SITEMAP_SHARD_SIZE)``
+
+Shards are keyed by post id, so a change rewrites only its own shard, the
+pages shard and the index. ``manage.py build_sitemaps`` writes everything.
+
+The files live on the local disk of each web instance, so they are kept in
+line with the database rather than with the process that saved a post:
+``sync()`` compares a stamp of every shard (visible post count and latest
+``updated_at``, one grouped query) with the stamp the files were built from
+and rewrites what differs. It runs after every post/category save in that
+process, and ``SitemapFilesMiddleware`` calls ``ensure_fresh()`` before
+serving a file, so posts published by the cron job or another instance, and
+a disk wiped by a redeploy, are picked up within ``SITEMAP_CHECK_INTERVAL``
+seconds.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sitemaps.views import SitemapIndexItem
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.template.loader import render_to_string
+
+SITEMAP_ROOT = getattr(settings, 'SITEMAP_ROOT', os.path.join(settings.BASE_DIR, 'sitemaps'))
+SHARD_SIZE = getattr(settings, 'SITEMAP_SHARD_SIZE', 10000)
+DOMAIN = getattr(settings, 'SITEMAP_DOMAIN', 'aplyfly.com')
+MAX_AGE = getattr(settings, 'SITEMAP_MAX_AGE', 60 * 60)
+CHECK_INTERVAL = getattr(settings, 'SITEMAP_CHECK_INTERVAL', 60)
+PROTOCOL = 'https'
+
+INDEX_FILES = ('sitemap_index.xml', 'sitemap.xml')
+PAGES_FILE = 'sitemap-pages.xml'
+POSTS_PREFIX = 'sitemap-posts-'
+STAMP_FILE = '.stamp.json'
+
+logger = logging.getLogger(__name__)
+
+_sync_lock = threading.Lock()
+_checked_at = None
+
+
+class _Site:
+    """Stand-in for ``Site``/``RequestSite``: files are built outside any request"""
+    domain = name = DOMAIN
+
+
+def shard_of(post_id):
+    return post_id // SHARD_SIZE
+
+
+def _posts_file(shard):
+    return f'{POSTS_PREFIX}{shard}.xml'
+
+
+def _write(name, content):
+    # Write then rename so a crawler never reads a half-written file
+    os.makedirs(SITEMAP_ROOT, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SITEMAP_ROOT, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            tmp.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(SITEMAP_ROOT, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _urlset(*sitemaps):
+    urls = []
+    for sitemap in sitemaps:
+        urls += sitemap.get_urls(site=_Site, protocol=PROTOCOL)
+    return render_to_string('sitemap.xml', {'urlset': urls})
+
+
+def _shard_stats():
+    """``{shard: (post count, latest updated_at)}`` for every shard with visible posts, one query"""
+    from .models import BlogPost
+
+    rows = BlogPost.objects.visible().annotate(
+        shard=F('id') / SHARD_SIZE
+    ).order_by().values('shard').annotate(
+        total=Count('id'), lastmod=Max('updated_at')
+    ).values_list('shard', 'total', 'lastmod')
+    return {shard: (total, lastmod) for shard, total, lastmod in rows}
+
+
+def _shard_lastmods():
+    """``{shard: latest updated_at}`` for every shard with visible posts, one query"""
+    return {shard: lastmod for shard, (total, lastmod) in _shard_stats().items()}
+
+
+def _stamp(stats):
+    """What the files are built from: every shard's stats plus the categories"""
+    from .models import BlogCategory
+
+    categories = BlogCategory.objects.aggregate(total=Count('id'), last=Max('id'))
+    return {
+        'pages': f"{categories['total']}:{categories['last']}",
+        'shards': {str(shard): f'{total}:{lastmod.isoformat()}' for shard, (total, lastmod) in stats.items()},
+    }
+
+
+def _built_stamp():
+    """Stamp of the files on disk, ``None`` if they were never (fully) built"""
+    if not os.path.exists(os.path.join(SITEMAP_ROOT, INDEX_FILES[0])):
+        return None
+    try:
+        with open(os.path.join(SITEMAP_ROOT, STAMP_FILE), encoding='utf-8') as stamp_file:
+            return json.load(stamp_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_posts_shard(shard):
+    from .sitemaps import BlogPostSitemap
+
+    _write(_posts_file(shard), _urlset(BlogPostSitemap(shard=shard)))
+
+
+def write_pages():
+    from .sitemaps import BlogCategorySitemap, StaticViewSitemap
+
+    _write(PAGES_FILE, _urlset(StaticViewSitemap(), BlogCategorySitemap()))
+
+
+def write_index(lastmods=None):
+    if lastmods is None:
+        lastmods = _shard_lastmods()
+    base = f'{PROTOCOL}://{DOMAIN}/'
+    items = [SitemapIndexItem(base + PAGES_FILE, None)] + [
+        SitemapIndexItem(base + _posts_file(shard), lastmod)
+        for shard, lastmod in sorted(lastmods.items())
+    ]
+    content = render_to_string('sitemap_index.xml', {'sitemaps': items})
+    for name in INDEX_FILES:
+        _write(name, content)
+    return lastmods
+
+
+def build_all():
+    """Write every shard and the index, dropping shards left without posts. Returns the shard count."""
+    stats = _shard_stats()
+    lastmods = {shard: lastmod for shard, (total, lastmod) in stats.items()}
+    for shard in lastmods:
+        write_posts_shard(shard)
+    write_pages()
+    write_index(lastmods)
+
+    wanted = {_posts_file(shard) for shard in lastmods}
+    for name in os.listdir(SITEMAP_ROOT):
+        if name.startswith(POSTS_PREFIX) and name not in wanted:
+            os.unlink(os.path.join(SITEMAP_ROOT, name))
+    _write(STAMP_FILE, json.dumps(_stamp(stats)))
+    return len(lastmods)
+
+
+def sync(post_ids=(), pages=False):
+    """
+    Rewrite the files that no longer match the database: shards whose stats
+    changed (plus those of ``post_ids``), then the pages shard and the index.
+    Builds everything if the files are missing.
+    """
+    built = _built_stamp()
+    if built is None:
+        # Nothing built yet: an index pointing to missing shards is worse than none
+        build_all()
+        return
+
+    stats = _shard_stats()
+    stamp = _stamp(stats)
+    shards = {shard_of(post_id) for post_id in post_ids}
+    shards |= {shard for shard in stats if built['shards'].get(str(shard)) != stamp['shards'][str(shard)]}
+    shards |= {int(shard) for shard in built['shards']} - set(stats)
+    if not shards and not pages and built['pages'] == stamp['pages']:
+        return
+
+    for shard in shards:
+        if shard in stats:
+            write_posts_shard(shard)
+        else:
+            try:
+                os.unlink(os.path.join(SITEMAP_ROOT, _posts_file(shard)))
+            except FileNotFoundError:
+                pass
+    # Category lastmod follows its posts
+    write_pages()
+    write_index({shard: lastmod for shard, (total, lastmod) in stats.items()})
+    _write(STAMP_FILE, json.dumps(stamp))
+
+
+def ensure_fresh():
+    """``sync()`` at most once every ``SITEMAP_CHECK_INTERVAL`` seconds per process"""
+    global _checked_at
+
+    if _checked_at is not None and time.monotonic() - _checked_at < CHECK_INTERVAL:
+        return
+    # Another thread is already syncing: serve the current files
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        if _checked_at is not None and time.monotonic() - _checked_at < CHECK_INTERVAL:
+            return
+        # Even if it fails, so a broken database is not queried on every crawl
+        _checked_at = time.monotonic()
+        sync()
+    except Exception:
+        logger.exception('No se pudieron actualizar los sitemaps en %s', SITEMAP_ROOT)
+    finally:
+        _sync_lock.release()
+
+
+def refresh_posts(post_ids):
+    """Rewrite the shards containing ``post_ids`` once the current transaction commits"""
+    post_ids = list(post_ids)
+    transaction.on_commit(lambda: sync(post_ids))
+
+
+def refresh_pages():
+    """Rewrite the pages shard (categories) once the current transaction commits"""
+    transaction.on_commit(lambda: sync(pages=True))
@@ -1,7 +1,9 @@
 from django.contrib import sitemaps
+from django.db.models import Max, Q
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from core import sitemap_files
 from core.models import BlogPost, BlogCategory
 
 class BlogPostSitemap(sitemaps.Sitemap):
@@ -9,8 +11,16 @@ class BlogPostSitemap(sitemaps.Sitemap):
     priority = 0.9
     protocol = 'https'
 
+    def __init__(self, shard=None):
+        # Limit to one id block of the pre-built files (core.sitemap_files)
+        self.shard = shard
+
     def items(self):
-        return BlogPost.objects.filter(status='published').order_by('-published_at')
+        posts = BlogPost.objects.visible().only('slug', 'updated_at').order_by('-published_at')
+        if self.shard is not None:
+            start = self.shard * sitemap_files.SHARD_SIZE
+            posts = posts.filter(id__gte=start, id__lt=start + sitemap_files.SHARD_SIZE)
+        return posts
 
     def lastmod(self, obj):
         return obj.updated_at
@@ -29,11 +39,10 @@ class GoogleNewsSitemap(sitemaps.Sitemap):
     def items(self):
         # Google News solo indexa contenido de últimos 2 días
         two_days_ago = timezone.now() - timedelta(days=2)
-        return BlogPost.objects.filter(
-            status='published',
+        return BlogPost.objects.visible().filter(
             is_news=True,
             published_at__gte=two_days_ago
-        ).order_by('-published_at')
+        ).only('slug', 'updated_at', 'meta_keywords', 'news_keywords_extra').order_by('-published_at')
 
     def lastmod(self, obj):
         return obj.updated_at
@@ -67,15 +76,13 @@ class BlogCategorySitemap(sitemaps.Sitemap):
     protocol = 'https'
 
     def items(self):
-        return BlogCategory.objects.all()
+        # Most recent visible post per category, aggregated in the same query
+        return BlogCategory.objects.annotate(
+            last_post_updated_at=Max('posts__updated_at', filter=Q(posts__is_visible=True))
+        ).order_by('name')
 
     def lastmod(self, obj):
-        # Get most recent post in category
-        latest_post = BlogPost.objects.filter(
-            category=obj, 
-            status='published'
-        ).order_by('-updated_at').first()
-        return latest_post.updated_at if latest_post else obj.created_at
+        return obj.last_post_updated_at or obj.created_at
 
     def location(self, obj):
         return f'/blog/categoria/{obj.slug}/'
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import chat_prompt, related_posts, view_counter
+from core.models import BlogCategory, BlogPost, RelatedPostScore
+
+
+# The dynamic view, not the pre-built files served by the middleware
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != 'core.middleware.SitemapFilesMiddleware'])
+class SitemapQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_categories(self, count, posts_per_category=2):
+        start = BlogCategory.objects.count()
+        published_at = timezone.now() - timedelta(days=1)
+        for index in range(start, start + count):
+            category = BlogCategory.objects.create(name=f'Categoría {index}')
+            for number in range(posts_per_category):
+                BlogPost.objects.create(
+                    title=f'Artículo {index}-{number}',
+                    category=category,
+                    excerpt='Resumen',
+                    content='<p>Contenido</p>',
+                    status='published',
+                    published_at=published_at,
+                )
+
+    def test_category_lastmod_does_not_add_queries_per_category(self):
+        self.create_categories(2)
+        with CaptureQueriesContext(connection) as baseline:
+            response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+
+        self.create_categories(5)
+        with self.assertNumQueries(len(baseline)):
+            response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b'/blog/categoria/'), 7)
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = BlogPost.objects.create(
+            title='Artículo', excerpt='Resumen', content='<p>Contenido</p>',
+            status='published', published_at=timezone.now(),
+        )
+
+    # No automatic flush while recording
+    @mock.patch.object(view_counter, 'FLUSH_INTERVAL', 3600)
+    @mock.patch.object(view_counter, 'MAX_PENDING', 1000)
+    def test_hits_stay_buffered_when_the_update_fails(self):
+        for _ in range(3):
+            view_counter.record_view(self.post.pk)
+
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                view_counter.flush([self.post.pk])
+        self.assertEqual(view_counter.pending_views(self.post.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(view_counter.flush([self.post.pk]), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(view_counter.pending_views(self.post.pk), 0)
+
+
+class ChatPromptTests(TestCase):
+    @override_settings(CHAT_MESSAGE_TOKEN_LIMIT=10, CHAT_PROMPT_TOKEN_BUDGET=100)
+    def test_budgets_follow_settings(self):
+        messages, report = chat_prompt.build_messages('Sistema', 'palabra ' * 50)
+        self.assertEqual(report['budget'], 100)
+        self.assertTrue(report['user_truncated'])
+        self.assertLessEqual(chat_prompt.estimate_tokens(messages[-1]['content']), 10)
+
+
+class RelatedPostsTests(TestCase):
+    def create_post(self, title, **fields):
+        fields.setdefault('status', 'published')
+        fields.setdefault('published_at', timezone.now() - timedelta(hours=1))
+        return BlogPost.objects.create(title=title, excerpt=title, content=f'<p>{title}</p>', **fields)
+
+    def test_unchanged_run_writes_nothing(self):
+        self.create_post('Agentes de inteligencia artificial')
+        self.create_post('Inteligencia artificial para empresas')
+        self.create_post('Agentes empresariales')
+
+        self.assertEqual(related_posts.compute_related(), 3)
+        self.assertEqual(related_posts.compute_related(), 0)
+
+        self.create_post('Agentes de inteligencia artificial empresariales')
+        self.assertGreater(related_posts.compute_related(), 0)
+        self.assertEqual(related_posts.compute_related(), 0)
+
+    def test_scheduled_posts_join_when_published(self):
+        first = self.create_post('Agentes de inteligencia artificial')
+        self.create_post('Inteligencia artificial para empresas')
+        scheduled = self.create_post(
+            'Agentes de inteligencia artificial empresariales',
+            published_at=timezone.now() + timedelta(hours=1),
+        )
+        related_posts.compute_related()
+        self.assertFalse(RelatedPostScore.objects.filter(related=scheduled).exists())
+        self.assertFalse(RelatedPostScore.objects.filter(post=scheduled).exists())
+
+        BlogPost.objects.filter(pk=scheduled.pk).update(published_at=timezone.now() - timedelta(minutes=1))
+        call_command('publish_scheduled_posts', stdout=StringIO())
+        self.assertTrue(RelatedPostScore.objects.filter(post=scheduled).exists())
+        self.assertTrue(RelatedPostScore.objects.filter(post=first, related=scheduled).exists())
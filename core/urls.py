@@ -1,6 +1,5 @@
 from django.urls import path
-from django.views.generic import TemplateView
-from . import views
+from . import seo_views, views
 
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
@@ -13,5 +12,5 @@ urlpatterns = [
     path('api/chat/test/', views.chat_test_view, name='chat_test'),
     
     # SEO
-    path('robots.txt', TemplateView.as_view(template_name='robots.txt', content_type='text/plain'), name='robots'),
+    path('robots.txt', seo_views.robots_txt, name='robots'),
 ]
@@ -0,0 +1,137 @@
+"""
+Write-behind view counter for blog posts.
+
+Hits are accumulated in the cache (``blog:views:<id>``, shared between workers
+when a shared backend such as Redis is configured) and periodically written to
+``BlogPost.views_count`` as atomic ``F('views_count') + n`` batch updates.
+
+A worker flushes when it has buffered ``BLOG_VIEWS_MAX_PENDING`` hits or when
+``BLOG_VIEWS_FLUSH_INTERVAL`` seconds have passed since its last flush, so a
+crash loses at most that many hits per worker. Counters are decremented only
+once the database update has committed: a failed write leaves the hits in the
+cache for the next flush.
+
+``manage.py flush_blog_views`` forces a flush of every post. It runs in its
+own process and reads the hits from the cache, so it needs the shared backend
+(``REDIS_URL``): with the per-process LocMem cache it sees no hits, and each
+web worker only writes its own, on the interval above and at exit.
+"""
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+FLUSH_INTERVAL = getattr(settings, 'BLOG_VIEWS_FLUSH_INTERVAL', 30)
+MAX_PENDING = getattr(settings, 'BLOG_VIEWS_MAX_PENDING', 100)
+
+KEY_PREFIX = 'blog:views:'
+FLUSH_LOCK_KEY = 'blog:views:flush-lock'
+FLUSH_LOCK_TIMEOUT = 60
+
+_lock = threading.Lock()
+_dirty = set()
+_pending = 0
+_last_flush = time.monotonic()
+
+
+def _key(post_id):
+    return f'{KEY_PREFIX}{post_id}'
+
+
+def record_view(post_id):
+    """Buffer one view of ``post_id``; flushes to the database when due"""
+    global _pending
+
+    key = _key(post_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+    with _lock:
+        _dirty.add(post_id)
+        _pending += 1
+        due = _pending >= MAX_PENDING or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+
+    if due:
+        flush()
+
+
+def pending_views(post_id):
+    """Views of ``post_id`` buffered but not yet written to the database"""
+    return cache.get(_key(post_id), 0)
+
+
+def flush(post_ids=None):
+    """
+    Write buffered views to the database.
+
+    Flushes the posts this worker has seen plus ``post_ids`` (the management
+    command passes every post). Returns the number of views written.
+    """
+    global _pending, _last_flush
+
+    with _lock:
+        ids = set(_dirty)
+        _dirty.clear()
+        _pending = 0
+        _last_flush = time.monotonic()
+    if post_ids is not None:
+        ids.update(post_ids)
+    if not ids:
+        return 0
+
+    # Only one flusher at a time, otherwise two workers could write the same hits
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TIMEOUT):
+        with _lock:
+            _dirty.update(ids)
+        return 0
+
+    try:
+        keys = {_key(post_id): post_id for post_id in ids}
+        counts = {key: count for key, count in cache.get_many(keys).items() if count}
+        increments = defaultdict(list)
+        for key, count in counts.items():
+            increments[count].append(keys[key])
+
+        from .models import BlogPost
+
+        with transaction.atomic():
+            for count, batch in increments.items():
+                BlogPost.objects.filter(pk__in=batch).update(views_count=F('views_count') + count)
+            # The lock is held until the hits are taken out of the cache
+            transaction.on_commit(lambda: _written(counts))
+    except Exception:
+        cache.delete(FLUSH_LOCK_KEY)
+        with _lock:
+            _dirty.update(ids)
+        raise
+    return sum(counts.values())
+
+
+def _written(counts):
+    try:
+        for key, count in counts.items():
+            try:
+                # decr keeps hits recorded while we flushed
+                cache.decr(key, count)
+            except ValueError:
+                pass  # evicted meanwhile
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
@@ -2,18 +2,18 @@ from django.shortcuts import render
 from django.views.generic import TemplateView, ListView, DetailView
 from django.views.generic.edit import FormView
 from django.urls import reverse_lazy
-from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_http_methods
 from datetime import datetime
 import json
-import asyncio
-from .models import Service
+from asgiref.sync import sync_to_async
+from .models import ChatConversation, Service
 from .forms import ContactForm
 from portfolio.models import Project
-from .ai_agent import aplyfly_agent
+from . import chat_admission, chat_stream
+from .ai_agent import get_agent
 
 class IndexView(TemplateView):
     template_name = 'core/index_modern.html'
@@ -69,49 +69,53 @@ def servicios_ia_view(request):
 
 # ============ VISTAS DEL CHAT IA ============
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def chat_api_view(request):
+async def chat_api_view(request):
     """
     API endpoint para el chat con IA
-    Maneja tanto respuestas normales como streaming
+    Maneja tanto respuestas normales como streaming.
+    Vista async: servida por ASGI, el streaming no ocupa un worker mientras el modelo genera.
     """
+    # require_http_methods no soporta vistas async en Django 4.2
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    admitted = False
     try:
         data = json.loads(request.body)
         message = data.get('message', '').strip()
-        history = data.get('history', [])
         streaming = data.get('streaming', False)
         
         if not message:
             return JsonResponse({'error': 'Mensaje requerido'}, status=400)
         
+        # Cuota por IP y límite de llamadas al modelo en curso (429 + Retry-After si no hay sitio)
+        rejection = await chat_admission.admit(request)
+        if rejection is not None:
+            return rejection
+        admitted = True
+        
+        # El historial vive en el servidor: el cliente solo envía el mensaje nuevo y el id
+        conversation = await ChatConversation.aresume(data.get('conversation_id'))
+        summary, history = conversation.prompt_history()
+        conversation.add_message('user', message)
+        await conversation.asave()
+        
         if streaming:
             # Respuesta streaming
-            def stream_response():
+            async def stream_response():
+                parts = []
                 try:
-                    # Crear event loop para async
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
-                    async def get_streaming_response():
-                        async for chunk in aplyfly_agent.get_chat_response(message, history):
-                            yield f"data: {json.dumps({'type': 'content', 'chunk': chunk})}\n\n"
-                        yield f"data: {json.dumps({'type': 'end'})}\n\n"
-                    
-                    # Ejecutar la función async
-                    async_gen = get_streaming_response()
-                    
-                    try:
-                        while True:
-                            chunk = loop.run_until_complete(async_gen.__anext__())
-                            yield chunk
-                    except StopAsyncIteration:
-                        pass
-                    finally:
-                        loop.close()
-                        
+                    # Deltas agrupados en tramas de ~64 caracteres o 30 ms (core.chat_stream)
+                    async for chunk in chat_stream.coalesce(get_agent().get_chat_response(message, history, summary)):
+                        parts.append(chunk)
+                        yield chat_stream.sse_event({'type': 'content', 'chunk': chunk})
+                    conversation.add_message('assistant', ''.join(parts))
+                    await conversation.asave()
+                    yield chat_stream.sse_event({'type': 'end'})
                 except Exception as e:
-                    yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+                    yield chat_stream.sse_event({'type': 'error', 'error': str(e)})
+                finally:
+                    chat_admission.controller.release()
             
             response = StreamingHttpResponse(
                 stream_response(),
@@ -119,13 +123,18 @@ def chat_api_view(request):
             )
             response['Cache-Control'] = 'no-cache'
             response['X-Accel-Buffering'] = 'no'
+            response['X-Conversation-Id'] = str(conversation.id)
+            admitted = False  # el generador libera el hueco al terminar el streaming
             return response
         
         else:
-            # Respuesta normal
-            response = aplyfly_agent.get_response_sync(message, history)
+            # Respuesta normal (cliente síncrono en un hilo aparte para no bloquear el event loop)
+            response = await sync_to_async(get_agent().get_response_sync, thread_sensitive=False)(message, history, summary)
+            conversation.add_message('assistant', response or '')
+            await conversation.asave()
             return JsonResponse({
                 'response': response,
+                'conversation_id': str(conversation.id),
                 'status': 'success'
             })
     
@@ -133,6 +142,12 @@ def chat_api_view(request):
         return JsonResponse({'error': 'JSON inválido'}, status=400)
     except Exception as e:
         return JsonResponse({'error': f'Error interno: {str(e)}'}, status=500)
+    finally:
+        if admitted:
+            chat_admission.controller.release()
+
+# csrf_exempt no soporta vistas async en Django 4.2; el middleware CSRF solo mira este atributo
+chat_api_view.csrf_exempt = True
 
 @require_http_methods(["GET"])
 def chat_test_view(request):
@@ -144,5 +159,8 @@ def chat_test_view(request):
         'agent': 'AplyBot',
         'version': '1.0',
         'services': ['web', 'ia', 'mobile', 'api', 'consulting'],
-        'message': '🤖 Chat IA funcionando correctamente'
+        'message': '🤖 Chat IA funcionando correctamente',
+        'response_cache': get_agent().response_cache.stats(),
+        'admission': chat_admission.controller.stats(),
+        'coalescing': get_agent().single_flight.stats(),
     })
@@ -3,6 +3,9 @@ ASGI config for mydevsite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Production serves it with gunicorn's uvicorn worker (see Procfile), so async
+views such as the streaming chat API don't hold a worker while they wait.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
     
     # Aplicaciones de terceros
     # 'compressor',  # Temporarily disabled due to compatibility issues
@@ -44,7 +45,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir archivos estáticos
+    'core.middleware.StaticFilesMiddleware',  # WhiteNoise, también en modo async (ASGI)
+    'core.middleware.SitemapFilesMiddleware',  # Sitemaps pre-generados (core.sitemap_files)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -91,6 +93,76 @@ else:
         }
     }
 
+# Cache (Redis compartido entre workers si REDIS_URL está definido)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'aplyfly',
+        }
+    }
+
+# Las cachés versionadas del blog (páginas, sidebar, 304) solo son coherentes si todos
+# los procesos ven la misma versión: con LocMem y varios workers se desactivan
+BLOG_CACHE_SHARED = bool(os.getenv('REDIS_URL')) or int(os.getenv('WEB_CONCURRENCY', '1')) <= 1
+
+# Cache de páginas del blog (segundos; las entradas se versionan, no se borran)
+BLOG_PAGE_CACHE_TIMEOUT = int(os.getenv('BLOG_PAGE_CACHE_TIMEOUT', str(60 * 60 * 24)))
+BLOG_SIDEBAR_TIMEOUT = int(os.getenv('BLOG_SIDEBAR_TIMEOUT', '300'))  # refresco del ranking de populares
+
+# Artículos relacionados (TF-IDF precalculado)
+BLOG_RELATED_TOP_K = int(os.getenv('BLOG_RELATED_TOP_K', '6'))
+# Por defecto los recalcula el cron compute_related_posts; True los recalcula tras cada guardado
+BLOG_RELATED_ON_SAVE = os.getenv('BLOG_RELATED_ON_SAVE', 'False') == 'True'
+
+# Contador de visitas del blog (write-behind)
+BLOG_VIEWS_FLUSH_INTERVAL = int(os.getenv('BLOG_VIEWS_FLUSH_INTERVAL', '30'))  # segundos
+BLOG_VIEWS_MAX_PENDING = int(os.getenv('BLOG_VIEWS_MAX_PENDING', '100'))  # visitas por worker
+
+# Sitemap de Google News: cuerpo cacheado (True) o streaming desde la base de datos (False)
+BLOG_NEWS_SITEMAP_CACHE = os.getenv('BLOG_NEWS_SITEMAP_CACHE', 'True') == 'True'
+
+# Sitemaps pre-generados (core.sitemap_files)
+SITEMAP_ROOT = os.getenv('SITEMAP_ROOT', os.path.join(BASE_DIR, 'sitemaps'))
+SITEMAP_SHARD_SIZE = int(os.getenv('SITEMAP_SHARD_SIZE', '10000'))  # ids de artículo por archivo
+SITEMAP_DOMAIN = os.getenv('SITEMAP_DOMAIN', 'aplyfly.com')
+SITEMAP_MAX_AGE = int(os.getenv('SITEMAP_MAX_AGE', '3600'))  # segundos
+SITEMAP_CHECK_INTERVAL = int(os.getenv('SITEMAP_CHECK_INTERVAL', '60'))  # segundos entre comprobaciones contra la BD
+
+# Chat IA: agrupación de deltas en tramas SSE (core.chat_stream)
+CHAT_STREAM_FLUSH_CHARS = int(os.getenv('CHAT_STREAM_FLUSH_CHARS', '64'))
+CHAT_STREAM_FLUSH_MS = int(os.getenv('CHAT_STREAM_FLUSH_MS', '30'))
+
+# Chat IA: conversaciones guardadas en el servidor (core.models.ChatConversation)
+CHAT_CONVERSATION_IDLE_TIMEOUT = int(os.getenv('CHAT_CONVERSATION_IDLE_TIMEOUT', '7200'))  # segundos
+CHAT_HISTORY_MESSAGES = int(os.getenv('CHAT_HISTORY_MESSAGES', '10'))  # mensajes de contexto para el modelo
+
+# Chat IA: presupuesto de tokens del prompt (core.chat_prompt, tokens estimados)
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv('CHAT_PROMPT_TOKEN_BUDGET', '2500'))  # prompt completo
+CHAT_MESSAGE_TOKEN_LIMIT = int(os.getenv('CHAT_MESSAGE_TOKEN_LIMIT', '600'))  # por mensaje
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1200'))  # historial antes de resumir
+CHAT_SUMMARY_TOKEN_LIMIT = int(os.getenv('CHAT_SUMMARY_TOKEN_LIMIT', '300'))  # resumen acumulado
+
+# Chat IA: control de admisión (core.chat_admission)
+CHAT_MAX_IN_FLIGHT = int(os.getenv('CHAT_MAX_IN_FLIGHT', '8'))  # llamadas al modelo simultáneas por worker
+CHAT_QUEUE_SIZE = int(os.getenv('CHAT_QUEUE_SIZE', '16'))  # peticiones en espera por worker
+CHAT_QUEUE_TIMEOUT = float(os.getenv('CHAT_QUEUE_TIMEOUT', '5'))  # segundos máximos en espera
+CHAT_IP_QUOTA = int(os.getenv('CHAT_IP_QUOTA', '20'))  # mensajes por IP en la ventana (0 = sin cuota)
+CHAT_IP_WINDOW = int(os.getenv('CHAT_IP_WINDOW', '60'))  # segundos
+CHAT_PROXY_COUNT = int(os.getenv('CHAT_PROXY_COUNT', '0'))  # proxies de confianza delante (X-Forwarded-For)
+
+# Chat IA: telemetría por petición (core.chat_telemetry, panel en /administrador/chat/)
+CHAT_TELEMETRY = os.getenv('CHAT_TELEMETRY', 'True') == 'True'
+CHAT_TELEMETRY_BATCH_SIZE = int(os.getenv('CHAT_TELEMETRY_BATCH_SIZE', '50'))  # filas por escritura
+CHAT_TELEMETRY_FLUSH_INTERVAL = int(os.getenv('CHAT_TELEMETRY_FLUSH_INTERVAL', '10'))  # segundos
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
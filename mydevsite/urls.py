@@ -2,9 +2,9 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
 from core.sitemaps import BlogPostSitemap, BlogCategorySitemap, StaticViewSitemap
 from core.news_views import google_news_sitemap
+from core.seo_views import sitemap
 
 sitemaps = {
     'blog_posts': BlogPostSitemap,
@@ -6,7 +6,8 @@
 class AplyflyChatWidget {
     constructor() {
         this.isOpen = false;
-        this.conversationHistory = [];
+        this.conversationHistory = [];  // Solo para mostrar/exportar; el historial del modelo vive en el servidor
+        this.conversationId = sessionStorage.getItem('aplybotConversationId');
         this.isTyping = false;
         this.currentStreamingMessage = '';
         
@@ -239,6 +240,10 @@ class AplyflyChatWidget {
             this.updateConnectionStatus(true);
         } catch (error) {
             this.hideTypingIndicator();
+            if (error.userMessage) {
+                this.addBotMessage(error.userMessage);
+                return;
+            }
             this.addBotMessage('Disculpa, hubo un error de conexión. Por favor intenta nuevamente o contacta directamente a info@aplyfly.com 🔧');
             this.updateConnectionStatus(false);
             this.showStatusNotification('Error de conexión', 'error');
@@ -256,15 +261,32 @@ class AplyflyChatWidget {
                 },
                 body: JSON.stringify({
                     message: message,
-                    history: this.conversationHistory,
+                    conversation_id: this.conversationId,
                     streaming: true
                 })
             });
             
+            if (response.status === 429) {
+                // Servidor saturado o demasiados mensajes: mostrar su aviso en lugar de un error de conexión
+                const data = await response.json().catch(() => ({}));
+                const retryAfter = response.headers.get('Retry-After');
+                const error = new Error(data.error || 'Demasiadas peticiones');
+                error.userMessage = (data.error || 'AplyBot está muy ocupado ahora mismo.') +
+                    (retryAfter ? ` (${retryAfter} s)` : '') + ' ⏳';
+                throw error;
+            }
+            
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
+            // El servidor asigna (o renueva) el id de la conversación
+            const conversationId = response.headers.get('X-Conversation-Id');
+            if (conversationId) {
+                this.conversationId = conversationId;
+                sessionStorage.setItem('aplybotConversationId', conversationId);
+            }
+            
             // Manejar streaming response
             await this.handleStreamingResponse(response);
             
@@ -498,8 +520,10 @@ class AplyflyChatWidget {
                 this.quickSuggestions.style.display = 'flex';
             }
             
-            // Limpiar historial de conversación
+            // Limpiar historial de conversación (la próxima pregunta abre una conversación nueva)
             this.conversationHistory = [];
+            this.conversationId = null;
+            sessionStorage.removeItem('aplybotConversationId');
             
             this.showStatusNotification('Chat limpiado exitosamente', 'success');
         }